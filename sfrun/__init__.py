@@ -1,10 +1,14 @@
 "SQL export package"
 
-from .batch import run as run_batch
-from .df import run as run_df
-from .formats import Format
-from .runner import SqlRunner, SqlScript
-from .sql import run as run_sql
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .batch import run as run_batch
+    from .df import run as run_df
+    from .formats import Format
+    from .runner import SqlRunner, SqlScript
+    from .sql import run as run_sql
 
 __all__ = [
     "SqlRunner",
@@ -14,3 +18,20 @@ __all__ = [
     "Format",
     "run_sql",
 ]
+
+# exports are imported when first used, so that the CLI doesn't pay for modules it won't use, such as Snowpark
+_exports = {
+    "SqlRunner": (".runner", "SqlRunner"),
+    "SqlScript": (".runner", "SqlScript"),
+    "run_batch": (".batch", "run"),
+    "run_df": (".df", "run"),
+    "Format": (".formats", "Format"),
+    "run_sql": (".sql", "run"),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if (export := _exports.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attr = export
+    return getattr(import_module(module, __name__), attr)
@@ -1,19 +1,32 @@
 "Batch SQL runner for Snowflake database"
 
 import logging
+import sys
 from argparse import ArgumentParser, ArgumentTypeError
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, closing, contextmanager
 from enum import StrEnum
+from functools import partial
+from io import StringIO
 from pathlib import Path
+from queue import Empty, Queue
 from typing import Any
 
-from sfconn import with_connection, with_connection_args
+from sfconn import getconn, with_connection_args
 from snowflake.connector import SnowflakeConnection
 
+from .conn import with_connection
+from .dag import dependencies, label, run_graph, waves
+from .inserts import MAX_ROWS
+from .journal import Journal
+from .metrics import PROFILE_TOP, Metrics
 from .runner import SqlScript
-from .util import __version__, intersperse, natural
+from .util import __version__, intersperse, natural, ordered_map, positive
 
 logger = logging.getLogger(__name__)
 
+CONNECTION_ARGS = ["keyfile_pfx_map", "connection_name", "database", "role", "schema", "warehouse"]  # of with_connection
+
 
 class ErrorAction(StrEnum):
     STOP = "stop"
@@ -21,23 +34,137 @@ class ErrorAction(StrEnum):
     SKIP_FILE = "skip-file"
 
 
+class ConnectionPool:
+    "connections for scripts that run at the same time; cnx is used first, and more are opened with connect() as needed"
+
+    def __init__(self, cnx: SnowflakeConnection, connect: Callable[[], SnowflakeConnection] | None = None):
+        self.idle: Queue[SnowflakeConnection] = Queue()
+        self.idle.put(cnx)
+        self.connect = connect
+        self.opened: list[SnowflakeConnection] = []
+
+    @contextmanager
+    def connection(self) -> Iterator[SnowflakeConnection]:
+        try:
+            cnx = self.idle.get_nowait()
+        except Empty:
+            if self.connect is None:
+                raise ValueError("connect is required to run scripts concurrently")
+            cnx = self.connect()
+            self.opened.append(cnx)
+        try:
+            yield cnx
+        finally:
+            self.idle.put(cnx)
+
+    def close(self) -> None:
+        "close connections that were opened by the pool"
+        for cnx in self.opened:
+            cnx.close()
+
+
 def run(
     cnx: SnowflakeConnection,
     scripts: list[Path | str | None],
     on_error: ErrorAction = ErrorAction.STOP,
+    jobs: int = 1,
+    connect: Callable[[], SnowflakeConnection] | None = None,
+    infer_deps: bool = False,
+    journal: Path | None = None,
+    resume: bool = False,
+    metrics: Path | None = None,
+    profile: int | None = None,
+    **options: Any,
+) -> int:
+    """run each sql from each file, or stdin if no files are supplied. With jobs > 1, up to jobs scripts run at the
+    same time, each on its own connection (cnx, and more as needed from connect()); output of each script is printed
+    as a whole, in order, once it completes. Scripts that depend on other scripts run after them. Statements that
+    complete are recorded in the journal, if one is given; with resume, statements recorded earlier are skipped.
+    Timings and sizes of statements are written to the metrics file, and with profile, the slowest statements are
+    printed, to stderr, once all scripts complete"""
+    if jobs > 1 and connect is None:
+        raise ValueError("connect is required to run scripts concurrently")
+    if resume and journal is None:
+        raise ValueError("a journal is required to resume")
+
+    with ExitStack() as stack:
+        if journal is not None:
+            options["journal"] = stack.enter_context(closing(Journal(journal, resume=resume)))
+        if metrics is not None or profile is not None:
+            stats = options["metrics"] = stack.enter_context(closing(Metrics(metrics)))
+            if profile is not None:
+                stack.callback(lambda: stats.profile(sys.stderr, profile))
+
+        if any(deps := dependencies(scripts, infer=infer_deps)):
+            return _run_graph(cnx, scripts, deps, on_error, jobs, connect, **options)
+
+        runner = (SqlScript(f, stop_on_error=on_error is not ErrorAction.CONTINUE, **options) for f in scripts)
+
+        if jobs == 1:
+            runs = intersperse(lambda x: x.run(cnx), runner)
+        else:
+            pool = stack.enter_context(closing(ConnectionPool(cnx, connect)))
+
+            def run_pooled(x: SqlScript) -> tuple[bool, str]:
+                with pool.connection() as c:
+                    out = StringIO()
+                    return x.run(c, stdout=out), out.getvalue()
+
+            def show(result: tuple[bool, str]) -> bool:
+                print(result[1], end="")
+                return result[0]
+
+            # with stop, scripts that already started, after one that failed, complete and their output is printed
+            stop = (lambda r: not r[0]) if on_error is ErrorAction.STOP else None
+            # closed before the connections, which waits for any scripts that are still running
+            runs = intersperse(show, stack.enter_context(closing(ordered_map(run_pooled, runner, jobs, stop=stop))))
+
+        if on_error is ErrorAction.STOP and jobs == 1:
+            return 1 if not all(runs) else 0
+
+        return 1 if sum(1 for r in runs if not r) > 0 else 0
+
+
+def _run_graph(
+    cnx: SnowflakeConnection,
+    scripts: list[Path | str | None],
+    deps: list[set[int]],
+    on_error: ErrorAction,
+    jobs: int,
+    connect: Callable[[], SnowflakeConnection] | None,
     **options: Any,
 ) -> int:
-    "run each sql from each file, or stdin if no files are supplied"
-    def run_script(x: SqlScript) -> bool:
-        return x.run(cnx)
+    "run scripts in dependency order; output of each script is printed as a whole when it completes"
+
+    def run_script(e: int) -> tuple[bool, str]:
+        x = SqlScript(scripts[e], stop_on_error=on_error is not ErrorAction.CONTINUE, **options)
+        with pool.connection() as c:
+            out = StringIO()
+            return x.run(c, stdout=out), out.getvalue()
 
-    runner = (SqlScript(f, stop_on_error=on_error is not ErrorAction.CONTINUE, **options) for f in scripts)
-    runs = intersperse(run_script, runner)
+    rc, started = 0, 0
+    with closing(ConnectionPool(cnx, connect)) as pool:
+        for e, result in run_graph(deps, run_script, lambda r: r[0], jobs, stop=on_error is ErrorAction.STOP):
+            if result is None:
+                logger.warning(f"{label(scripts[e], e)}: skipped, as a script it depends on failed")
+                rc = 1
+                continue
+            if started:
+                print()
+            print(result[1], end="")
+            started += 1
+            rc |= 0 if result[0] else 1
 
-    if on_error is ErrorAction.STOP:
-        return 1 if not all(runs) else 0
+    return 1 if started < len(scripts) else rc
 
-    return 1 if sum(1 for r in runs if not r) > 0 else 0
+
+def show_plan(scripts: list[Path | str | None], infer_deps: bool = False) -> None:
+    "print the order in which scripts would run: scripts of a wave run after all scripts of earlier waves complete"
+    deps = dependencies(scripts, infer=infer_deps)
+    for n, wave in enumerate(waves(deps), start=1):
+        for e in wave:
+            after = ", ".join(label(scripts[d], d) for d in sorted(deps[e]))
+            print(f"{n:>3}  {label(scripts[e], e)}" + (f"  (after {after})" if after else ""))
 
 
 @with_connection_args(__doc__)
@@ -78,6 +205,62 @@ def getargs(parser: ArgumentParser) -> None:
     parser.add_argument(
         "-o", "--out-dir", type=a_dir, help="store outputs in this directory with same name as DDL but with .out extension"
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=positive,
+        default=1,
+        help="run up to N scripts at the same time, each on its own connection; output is still in order (default 1)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        metavar="N",
+        type=positive,
+        default=1,
+        help="send up to N statements of a script in a single request, using multi-statement execution (default 1)",
+    )
+    parser.add_argument(
+        "--coalesce-inserts",
+        metavar="N",
+        type=positive,
+        nargs="?",
+        const=MAX_ROWS,
+        default=0,
+        help=f"run up to N (default {MAX_ROWS}) consecutive INSERT ... VALUES statements into the same table as one insert; "
+        "the combined statements are not echoed, only a comment with the range of statement numbers they were run as",
+    )
+    parser.add_argument(
+        "--infer-deps",
+        action="store_true",
+        help="besides '-- depends: FILE, ...' header comments, make scripts depend on scripts that create objects they use",
+    )
+    parser.add_argument("--plan", action="store_true", help="print the order in which scripts would run, and exit")
+    parser.add_argument(
+        "--journal",
+        metavar="PATH",
+        type=Path,
+        help="record each statement that completes (script, statement number and a hash of its text) in this file",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="with --journal, skip statements of each script that the journal shows completed, unless they were changed",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        type=Path,
+        help="write timings, query id, rows and output size of each statement to this file, as JSON lines",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="N",
+        type=positive,
+        nargs="?",
+        const=PROFILE_TOP,
+        help=f"once all scripts complete, print the N (default {PROFILE_TOP}) slowest statements to stderr",
+    )
     parser.add_argument("--version", action="version", version=__version__)
 
 
@@ -85,18 +268,27 @@ def cli(args: list[str] | None = None) -> int:
     "cli entry-point"
 
     @with_connection(logger)
-    def main(
-        cnx: SnowflakeConnection,
-        input: list[Path | None],
-        file: list[Path | None],
-        table: list[str],
-        query: list[str],
-        **kwargs: Any,
-    ) -> int:
+    def main(cnx: SnowflakeConnection, inputs: list[Path | str | None], **kwargs: Any) -> int:
         "proxy for the main() function"
-        inputs: list[Path | str | None] = input + file + [f"select * from {t}" for t in table] + query
-        if not inputs:
-            inputs = [None]
         return run(cnx, scripts=inputs, **kwargs)
 
-    return main(**vars(getargs(args)))  # type: ignore
+    opts = vars(getargs(args))
+    inputs: list[Path | str | None] = (
+        opts.pop("input") + opts.pop("file") + [f"select * from {t}" for t in opts.pop("table")] + opts.pop("query")
+    )
+    if not inputs:
+        inputs = [None]
+    if opts["resume"] and opts["journal"] is None:
+        raise SystemExit("--resume requires --journal")
+
+    try:
+        waves(dependencies(inputs, infer=opts["infer_deps"]))  # report a cycle before anything runs
+    except ValueError as err:
+        raise SystemExit(str(err))
+
+    if opts.pop("plan"):
+        show_plan(inputs, infer_deps=opts["infer_deps"])
+        return 0
+
+    connect = partial(getconn, **{k: opts[k] for k in CONNECTION_ARGS})
+    return main(inputs=inputs, connect=connect, **opts)  # type: ignore
@@ -0,0 +1,145 @@
+"Local on-disk cache of query results"
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from itertools import islice
+from logging import getLogger
+from pathlib import Path
+
+from snowflake.connector import SnowflakeConnection
+
+from .util import Data
+
+logger = getLogger(__name__)
+
+CHUNK_ROWS = 10_000
+_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+_READ_ONLY = re.compile(r"(?:\s+|--[^\n]*|//[^\n]*|/\*.*?\*/|\()*(?:select|with|show|describe|desc)\b", re.IGNORECASE | re.DOTALL)
+
+
+def default_dir() -> Path:
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "sfrun"
+
+
+def read_only(sql: str) -> bool:
+    "True for statements, such as SELECT, WITH, SHOW and DESCRIBE, that only read; only their results are cached"
+    return _READ_ONLY.match(sql) is not None
+
+
+def normalize(sql: str) -> str:
+    "collapse whitespace runs outside of quoted literals and identifiers"
+    return _TOKENS.sub(lambda m: m.group(1) or " ", sql.strip())
+
+
+@dataclass
+class ResultCache:
+    """
+    Results of previously run queries stored as pickled chunks of rows, preceded by column names and types, and
+    followed by the number of rows the result was truncated after, if it was. Only results of read-only statements are
+    cached. Entries expire `ttl` seconds after they are created; least recently used entries are evicted when the
+    total size exceeds `max_size` bytes (0 for no limit).
+    """
+
+    dir: Path
+    ttl: int
+    max_size: int = 0
+
+    def _path(self, cnx: SnowflakeConnection, sql: str, limit: int | None) -> Path:
+        ident = [cnx.account, cnx.user, cnx.role, cnx.warehouse, cnx.database, cnx.schema, normalize(sql), limit]
+        return self.dir / (hashlib.sha256(json.dumps(ident).encode()).hexdigest() + ".pkl")
+
+    def _fresh(self, path: Path) -> bool:
+        try:
+            created = path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        if time.time() - created > self.ttl:
+            path.unlink(missing_ok=True)
+            return False
+
+        return True
+
+    def contains(self, cnx: SnowflakeConnection, sql: str, limit: int | None) -> bool:
+        return read_only(sql) and self._fresh(self._path(cnx, sql, limit))
+
+    def get(self, cnx: SnowflakeConnection, sql: str, limit: int | None) -> tuple[list[str], list[type], Data] | None:
+        """return column names, types and rows of a cached result, or None if not cached or expired. If the result was
+        truncated, the warning is logged again once the rows are read"""
+        path = self._path(cnx, sql, limit)
+        if not read_only(sql) or not self._fresh(path):
+            return None
+
+        # access time tracks recency for eviction, modification time tracks age for expiry
+        os.utime(path, (time.time(), path.stat().st_mtime))
+        f = path.open("rb")
+        names, types = pickle.load(f)
+
+        def rows() -> Data:
+            with f:
+                while True:
+                    try:
+                        chunk = pickle.load(f)
+                    except EOFError:
+                        return
+                    if isinstance(chunk, int):
+                        logger.warning(f"data truncated after {chunk} rows")
+                    else:
+                        yield from chunk
+
+        logger.info(f"using cached result {path.name}")
+        return names, types, rows()
+
+    def put(
+        self,
+        cnx: SnowflakeConnection,
+        sql: str,
+        limit: int | None,
+        names: list[str],
+        types: list[type],
+        rows: Data,
+        truncated: Callable[[], int | None] = lambda: None,
+    ) -> Data:
+        """pass rows through, saving them in the cache if sql is read-only; the entry is saved only if all rows are
+        consumed. truncated() returns, once they are, the number of rows the result was truncated after, if it was"""
+        if not read_only(sql):
+            yield from rows
+            return
+
+        path = self._path(cnx, sql, limit)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        it = iter(rows)
+        try:
+            with tmp.open("wb") as f:
+                pickle.dump((names, types), f, protocol=pickle.HIGHEST_PROTOCOL)
+                while chunk := list(islice(it, CHUNK_ROWS)):
+                    pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    yield from chunk
+                if (n := truncated()) is not None:
+                    pickle.dump(n, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+        self.evict()
+
+    def evict(self) -> None:
+        "remove expired entries, then least recently used entries until the cache fits in max_size"
+        entries = [p for p in self.dir.glob("*.pkl") if self._fresh(p)]
+        if self.max_size <= 0:
+            return
+
+        stats = sorted(((p, p.stat()) for p in entries), key=lambda x: x[1].st_atime, reverse=True)
+        total = 0
+        for p, st in stats:
+            total += st.st_size
+            if total > self.max_size:
+                p.unlink(missing_ok=True)
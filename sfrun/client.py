@@ -0,0 +1,65 @@
+"""Thin client of the sfrun daemon (sfrun serve). With SFRUN_SOCKET set to the daemon's socket, sfrun and sfrunb commands
+run in the daemon, on connections it keeps open, instead of connecting each time. Only the standard library is used, so
+that the client starts quickly; commands run here, as usual, if the daemon is not running"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+from typing import Any
+
+SOCKET_ENV = "SFRUN_SOCKET"
+
+
+def default_socket() -> Path:
+    return Path(os.environ.get("XDG_RUNTIME_DIR") or Path.home() / ".cache" / "sfrun") / "sfrun.sock"
+
+
+def forward(prog: str, args: list[str], path: Path) -> int | None:
+    """run a command in the daemon listening at path, with stdin, stdout and stderr of this process, and return its exit
+    code; None if the daemon is not running"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(path))
+        except OSError:
+            return None
+        request = json.dumps({"prog": prog, "args": args, "cwd": os.getcwd(), "env": dict(os.environ)}).encode() + b"\n"
+        if (sent := socket.send_fds(s, [request], [0, 1, 2])) < len(request):
+            s.sendall(request[sent:])
+        reply = s.makefile("rb").readline()
+
+    if not reply:
+        print(f"{prog}: the daemon closed the connection before the command completed", file=sys.stderr)
+        return 1
+    return json.loads(reply)["rc"]
+
+
+def _forwarded(prog: str) -> int | None:
+    if not (path := os.environ.get(SOCKET_ENV)):
+        return None
+    return forward(prog, sys.argv[1:], Path(path))
+
+
+def sfrun() -> Any:
+    "sfrun entry-point"
+    if sys.argv[1:2] == ["serve"]:
+        from .serve import cli
+
+        return cli(sys.argv[2:])
+    if (rc := _forwarded("sfrun")) is not None:
+        return rc
+
+    from .main import cli
+
+    return cli()
+
+
+def sfrunb() -> Any:
+    "sfrunb entry-point"
+    if (rc := _forwarded("sfrunb")) is not None:
+        return rc
+
+    from .batch import cli
+
+    return cli()
@@ -0,0 +1,118 @@
+"Streaming compression of output files, done on a background thread"
+
+import bz2
+import io
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+from typing import IO, Any, BinaryIO, Protocol, Self
+
+from .sink import Sink, stdout_binary
+
+BUFFER_SIZE = 1024 * 1024
+QUEUE_DEPTH = 8
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes, /) -> bytes: ...
+    def flush(self) -> bytes: ...
+
+
+class Compression(StrEnum):
+    GZIP = "gzip"
+    ZSTD = "zstd"
+    BZ2 = "bz2"
+
+    @property
+    def suffix(self) -> str:
+        match self:
+            case self.GZIP:
+                return ".gz"
+            case self.ZSTD:
+                return ".zst"
+            case self.BZ2:
+                return ".bz2"
+
+    @classmethod
+    def from_path(cls, path: Path | None) -> Self | None:
+        "compression implied by the file extension, if any"
+        if path is None:
+            return None
+        return next((c for c in cls if path.suffix == c.suffix), None)
+
+    def compressor(self) -> Compressor:
+        match self:
+            case self.GZIP:
+                return zlib.compressobj(wbits=31)  # gzip header and trailer
+            case self.BZ2:
+                return bz2.BZ2Compressor()
+            case self.ZSTD:
+                try:
+                    import zstandard
+                except ImportError:
+                    raise ImportError("zstd compression requires 'zstandard' package to be installed")
+                return zstandard.ZstdCompressor().compressobj()
+
+
+class CompressedWriter(io.RawIOBase):
+    """binary stream that compresses and writes data to the target on a background thread; errors of the thread are
+    raised by a later write, or by close"""
+
+    def __init__(self, target: BinaryIO, compression: Compression, close_target: bool = True):
+        self.target = target
+        self.close_target = close_target
+        self.compressor = compression.compressor()
+        self.pool = ThreadPoolExecutor(1, thread_name_prefix="sfrun-compress")
+        self.pending: deque[Future[None]] = deque()
+
+    def _compress(self, data: bytes) -> None:
+        self.target.write(self.compressor.compress(data))
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        if len(self.pending) >= QUEUE_DEPTH:
+            self.pending.popleft().result()
+        data = bytes(b)
+        self.pending.append(self.pool.submit(self._compress, data))
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+            self.target.write(self.compressor.flush())
+            self.target.flush()
+        finally:
+            for f in self.pending:
+                f.cancel()
+            self.pool.shutdown()
+            if self.close_target:
+                self.target.close()
+            super().close()
+
+
+@dataclass(frozen=True)
+class OutputFile:
+    "an output file, or stdout if path is None, that is compressed as it is written"
+
+    path: Path | None
+    compression: Compression
+
+    def open(self, mode: str = "w") -> IO[Any]:
+        if self.path is None:
+            raw = CompressedWriter(stdout_binary(), self.compression, close_target=False)
+        else:
+            raw = CompressedWriter(self.path.open("wb"), self.compression)
+
+        buf = io.BufferedWriter(raw, BUFFER_SIZE)
+        return buf if "b" in mode else io.TextIOWrapper(buf)
+
+    def sink(self, buffer_size: int) -> Sink:
+        return Sink(self.open("wb"), buffer_size)  # type: ignore
@@ -0,0 +1,102 @@
+"Connections and Snowpark sessions of CLI runs; runs in the daemon (sfrun serve) borrow open ones instead of connecting"
+
+import logging
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from functools import wraps
+from logging import Logger
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from sfconn import getconn
+from snowflake.connector import Error, SnowflakeConnection
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import Session
+
+# set by daemon workers: lends an open connection, or a session if the flag is set, for the connection arguments
+lender: Callable[[dict[str, Any], bool], AbstractContextManager[Any]] | None = None
+
+
+def init_logging(logger: Logger, loglevel: int = logging.WARNING) -> None:
+    "same as sfconn's, except that a daemon, which does this for each run, doesn't add more than one handler"
+    if not logger.handlers:
+        h = logging.StreamHandler()
+        h.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logger.addHandler(h)
+    logger.setLevel(loglevel)
+
+
+@contextmanager
+def connection(**args: Any) -> Iterator[SnowflakeConnection]:
+    "connection for the connection arguments, which is closed after use unless it was lent by the daemon"
+    if lender is not None:
+        with lender(args, False) as cnx:
+            yield cnx
+    else:
+        with getconn(**args) as cnx:
+            yield cnx
+
+
+@contextmanager
+def session(**args: Any) -> Iterator["Session"]:
+    "Snowpark session for the connection arguments, which is closed after use unless it was lent by the daemon"
+    if lender is not None:
+        with lender(args, True) as sess:
+            yield sess
+    else:
+        from sfconn import getsess
+
+        with getsess(**args) as sess:
+            yield sess
+
+
+def _with(
+    open: Callable[..., AbstractContextManager[Any]], logger: Logger | None
+) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    "decorator, like sfconn's with_connection, that calls fn with what open() returns for the connection arguments"
+
+    def wrapper(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(fn)
+        def wrapped(
+            keyfile_pfx_map: tuple[Path, Path] | None,
+            connection_name: str | None,
+            database: str | None,
+            role: str | None,
+            schema: str | None,
+            warehouse: str | None,
+            loglevel: int = logging.WARNING,
+            *args: Any,
+            **kwargs: Any,
+        ) -> Any:
+            "script entry-point"
+            init_logging(logging.getLogger("sfconn"), loglevel)
+            if logger is not None:
+                init_logging(logger, loglevel)
+
+            try:
+                with open(
+                    keyfile_pfx_map=keyfile_pfx_map,
+                    connection_name=connection_name,
+                    database=database,
+                    role=role,
+                    schema=schema,
+                    warehouse=warehouse,
+                ) as cnx:
+                    return fn(cnx, *args, **kwargs)
+            except (Error, ValueError, OSError) as err:  # e.g. an unknown connection name, a missing key file
+                raise SystemExit(str(err))
+
+        return wrapped
+
+    return wrapper
+
+
+def with_connection(logger: Logger | None = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    "sfconn's with_connection, with connections from connection()"
+    return _with(connection, logger)
+
+
+def with_session(logger: Logger | None = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    "sfconn's with_session, with sessions from session()"
+    return _with(session, logger)
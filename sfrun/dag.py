@@ -0,0 +1,145 @@
+"Dependencies between batch scripts, and running scripts in dependency order"
+
+import re
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from logging import getLogger
+from pathlib import Path
+from typing import TypeVar
+
+T = TypeVar("T")
+
+DEPENDS = re.compile(r"--\s*depends\s*:(.*)", re.IGNORECASE)
+CREATES = re.compile(
+    r"\bcreate\s+(?:or\s+replace\s+)?(?:(?:local|global|secure|transient|temporary|temp|volatile|materialized|recursive|dynamic)\s+)*"
+    r"(?:table|view|function|procedure|sequence|stream|task)\s+(?:if\s+not\s+exists\s+)?([\w$.\"]+)",
+    re.IGNORECASE,
+)
+COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+REFERS = re.compile(r"\b(?:from|join|into|update|using|table|view|call)\s+([\w$.\"]+)", re.IGNORECASE)
+
+logger = getLogger(__name__)
+
+
+def label(script: Path | str | None, n: int) -> str:
+    "name of a script for messages; scripts that are not files are numbered"
+    return str(script) if isinstance(script, Path) else "stdin" if script is None else f"query #{n + 1}"
+
+
+def header_depends(text: str | Iterable[str]) -> list[str]:
+    """script names listed by `-- depends: a.sql, b.sql` directives in the comment lines at the start of a script; lines
+    after those are not read"""
+    names: list[str] = []
+    for line in text.splitlines() if isinstance(text, str) else text:
+        if not (line := line.strip()):
+            continue
+        if not line.startswith("--"):
+            break
+        if (m := DEPENDS.match(line)) is not None:
+            names += [n for n in re.split(r"[\s,]+", m[1]) if n]
+    return names
+
+
+def _normalize(name: str) -> str:
+    return name.replace('"', "").upper()
+
+
+def created_objects(text: str) -> set[str]:
+    "names, as written, of objects created by a script"
+    return {_normalize(m[1]) for m in CREATES.finditer(COMMENTS.sub(" ", text))}
+
+
+def dependencies(scripts: list[Path | str | None], infer: bool = False) -> list[set[int]]:
+    """for each script, indexes of the scripts it depends on. Dependencies are listed in header directives, with names
+    relative to the script's directory; with infer, scripts also depend on scripts that create objects they reference
+    (names that follow FROM, JOIN, INTO, UPDATE, USING, TABLE, VIEW or CALL). Without infer, only the header of each
+    script is read"""
+    paths = {s.resolve(): e for e, s in enumerate(scripts) if isinstance(s, Path)}
+    deps: list[set[int]] = [set() for _ in scripts]
+
+    def header(s: Path | str | None) -> list[str]:
+        if not isinstance(s, Path):
+            return header_depends(s or "")
+        with s.open() as f:
+            return header_depends(f)
+
+    for e, s in enumerate(scripts):
+        base = s.parent if isinstance(s, Path) else Path()
+        for name in header(s):
+            if (d := paths.get((base / name).resolve())) is None:
+                logger.warning(f"{label(s, e)}: ignoring dependency '{name}', it is not one of the scripts being run")
+            elif d != e:
+                deps[e].add(d)
+
+    if infer:
+        texts = [s.read_text() if isinstance(s, Path) else s or "" for s in scripts]
+        creates = [created_objects(t) for t in texts]
+        for e, text in enumerate(texts):
+            refs = {_normalize(n) for n in REFERS.findall(COMMENTS.sub(" ", text))} - creates[e]
+            deps[e] |= {d for d, objs in enumerate(creates) if d != e and objs & refs}
+
+    return deps
+
+
+def waves(deps: list[set[int]]) -> list[list[int]]:
+    "group scripts into waves; each script depends only on scripts of earlier waves. Raises ValueError on a cycle"
+    remaining = {e: set(d) for e, d in enumerate(deps)}
+    result: list[list[int]] = []
+    while remaining:
+        if not (wave := [e for e, d in remaining.items() if not d]):
+            raise ValueError(f"circular dependency between scripts: {sorted(remaining)}")
+        result.append(wave)
+        for e in wave:
+            del remaining[e]
+        for d in remaining.values():
+            d.difference_update(wave)
+    return result
+
+
+def run_graph(
+    deps: list[set[int]],
+    fn: Callable[[int], T],
+    ok: Callable[[T], bool],
+    jobs: int = 1,
+    stop: bool = True,
+) -> Iterator[tuple[int, T | None]]:
+    """call fn for each script, on up to jobs threads, once every script it depends on has succeeded, with ready scripts
+    started in input order. Yields (script, result) as scripts complete, and (script, None) for scripts that are skipped
+    because a script they depend on failed. With stop, no more scripts are started after the first failure"""
+    waves(deps)  # check for cycles before running anything
+    pending = {e: set(d) for e, d in enumerate(deps)}
+    dependents: list[list[int]] = [[] for _ in deps]
+    for e, d in enumerate(deps):
+        for x in d:
+            dependents[x].append(e)
+
+    def downstream(e: int) -> Iterable[int]:
+        "remove scripts that depend, directly or indirectly, on a failed script from pending"
+        for x in dependents[e]:
+            if pending.pop(x, None) is not None:
+                yield x
+                yield from downstream(x)
+
+    running: dict[Future[T], int] = {}
+    failed = False
+    with ThreadPoolExecutor(jobs) as pool:
+        while True:
+            if not (failed and stop):
+                for e in sorted(e for e, d in pending.items() if not d)[: jobs - len(running)]:
+                    del pending[e]
+                    running[pool.submit(fn, e)] = e
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in sorted(done, key=lambda f: running[f]):
+                e = running.pop(f)
+                result = f.result()
+                yield e, result
+                if ok(result):
+                    for x in dependents[e]:
+                        pending.get(x, set()).discard(e)
+                else:
+                    failed = True
+                    if not stop:
+                        yield from ((x, None) for x in sorted(downstream(e)))
@@ -2,16 +2,19 @@
 
 import importlib.util as iu
 import sys
+from dataclasses import replace
 from logging import getLogger
 from pathlib import Path
 from typing import Any, Iterable, cast
 
-from sfconn import pytype, with_session
+from sfconn import pytype
 from snowflake.snowpark import DataFrame, Session
+from snowflake.snowpark.types import DataType, DecimalType, TimestampTimeZone, TimestampType
 
 from . import __name__ as this_module
-from .formats import Format
-from .util import Command, ExportFn, SnowparkFn, prettify, take
+from .conn import with_session
+from .formats import Exporter, Format
+from .util import SOFT_LIMIT, Command, ExportFn, SnowparkFn, prettify, take
 
 
 def main_py(file: list[Path], fn: str, **kwargs: Any) -> None:
@@ -50,18 +53,33 @@ def show_sql(df: DataFrame) -> None:
         print(q + ";")
 
 
+def _column(t: DataType) -> tuple[str, int | None, int | None] | None:
+    "Snowflake type, precision and scale of a column, as result metadata of a query has them"
+    match t:
+        case DecimalType():
+            return "FIXED", t.precision, t.scale
+        case TimestampType() if t.tz is not TimestampTimeZone.DEFAULT:
+            return f"TIMESTAMP_{t.tz.value.upper()}", None, None
+        case _:
+            return None
+
+
 def _run(
     df: DataFrame,
     export: ExportFn = Format.default().export(),
     limit: int | None = None,
     pretty_headers: bool = False,
 ) -> None:
-    if limit is not None and limit > 0:
+    if limit is None:
+        df = df.limit(SOFT_LIMIT + 1)  # one extra row lets take() detect truncation
+    elif limit > 0:
         df = df.limit(limit)
 
     schema = df.schema
     field_names = [f.name[1:-1] if f.name.startswith('"') else f.name for f in schema.fields]
     types = [pytype(f.datatype) for f in schema.fields]
+    if isinstance(export, Exporter) and export.format in (Format.PARQUET, Format.ARROW):
+        export = replace(export, columns=tuple(_column(f.datatype) for f in schema.fields))
     data = take(df.to_local_iterator()) if limit is None else df.to_local_iterator()
 
     export(data, prettify(field_names) if pretty_headers else field_names, types)
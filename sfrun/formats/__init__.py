@@ -1,10 +1,16 @@
 from argparse import ArgumentParser, ArgumentTypeError
+from contextlib import contextmanager
+from dataclasses import dataclass
 from enum import Enum
+from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import Any, Callable, Self
+from typing import Any, Callable, Iterator, Self, cast
 
-from ..util import Data, ExportFn
-from . import csv, fmt, json, jsonl, md, raw, xls
+from ..compress import Compression, OutputFile
+from ..sink import BUFFER_SIZE
+from ..util import ArrowData, ArrowExportFn, Data, ExportFn, positive, textio
+from .parts import Part, part_path, write_manifest
 
 
 class Format(str, Enum):
@@ -16,6 +22,8 @@ class Format(str, Enum):
     XLS = "xls"
     JSON = "json"
     JSONL = "jsonl"
+    PARQUET = "parquet"
+    ARROW = "arrow"
 
     def arg_help(self) -> str:
         match self:
@@ -35,36 +43,86 @@ class Format(str, Enum):
                 return "JSON"
             case self.JSONL:
                 return "jsonline"
+            case self.PARQUET:
+                return "Parquet"
+            case self.ARROW:
+                return "Arrow IPC stream"
 
     @property
-    def _export(self) -> Callable[[Data, list[str], list[type], Path | None], None]:
+    def _export(self) -> Callable[[Data, list[str], list[type], Any], None]:
+        "format's row writer; format modules are imported only when used, as some depend on slow to import packages"
         match self:
             case self.FMT:
+                from . import fmt
+
                 return fmt.export
-            case self.CSV:
-                return csv.csv_export
-            case self.TSV:
-                return csv.tsv_export
+            case self.CSV | self.TSV:
+                from . import csv
+
+                return csv.csv_export if self is Format.CSV else csv.tsv_export
             case self.MD:
+                from . import md
+
                 return md.export
             case self.RAW:
+                from . import raw
+
                 return raw.export
             case self.XLS:
+                from . import xls
+
                 return xls.export  # type: ignore
             case self.JSON:
+                from . import json
+
                 return json.export
             case self.JSONL:
+                from . import jsonl
+
                 return jsonl.export
+            case self.PARQUET:
+                from . import parquet
 
-    def export(self, file: Path | None = None) -> ExportFn:
-        def wrapped(data: Data, headers: list[str], types: list[type]) -> None:
-            return self._export(data, headers, types, file)
+                return parquet.export  # type: ignore
+            case self.ARROW:
+                from . import ipc
 
-        if self._export is xls.export:
-            if file is None:
-                raise ValueError("file cannot be None when exporting in MS Excel format")
+                return ipc.export
 
-        return wrapped
+    @property
+    def _export_arrow(self) -> Callable[[ArrowData, list[str], list[type], Any], None] | None:
+        "Arrow-aware writer, for formats that can write record batches column by column"
+        match self:
+            case self.CSV | self.TSV | self.RAW | self.JSONL:
+                from . import columnar
+
+                return {
+                    self.CSV: columnar.csv_export,
+                    self.TSV: columnar.tsv_export,
+                    self.RAW: columnar.raw_export,
+                    self.JSONL: columnar.jsonl_export,
+                }[self]
+            case self.PARQUET:
+                from . import parquet
+
+                return parquet.export_arrow  # type: ignore
+            case self.ARROW:
+                from . import ipc
+
+                return ipc.export_arrow
+            case _:
+                return None
+
+    @property
+    def needs_file(self) -> bool:
+        "binary formats that cannot be written to stdout"
+        return self in (Format.XLS, Format.PARQUET)
+
+    def export(self, file: Path | None = None, **options: Any) -> "Exporter":
+        if self.needs_file and file is None:
+            raise ValueError(f"file cannot be None when exporting in {self.arg_help()} format")
+
+        return Exporter(self, file, **options)
 
     def export_arg(self, v: str) -> ExportFn:
         path = Path(v)
@@ -86,7 +144,7 @@ class Format(str, Enum):
         x = g.add_mutually_exclusive_group()
 
         for opt in cls:
-            path_args: dict[str, Any] = {} if opt == Format.XLS else dict(nargs="?", const=opt.export(None))
+            path_args: dict[str, Any] = {} if opt.needs_file else dict(nargs="?", const=opt.export(None))
 
             x.add_argument(
                 f"--{opt.value}",
@@ -95,7 +153,155 @@ class Format(str, Enum):
                 type=opt.export_arg,
                 default=cls.default().export(),
                 help=f"output in {opt.arg_help()} format",
-                **path_args
+                **path_args,
             )
 
+        g.add_argument(
+            "--compress",
+            choices=[c.value for c in Compression],
+            type=Compression,
+            help="compress text output; default is to infer from output file extension (.gz, .zst, .bz2)",
+        )
+        g.add_argument("--compact", action="store_true", help="for JSON output, write each object on a single line")
+        g.add_argument(
+            "--max-rows-per-file",
+            metavar="N",
+            type=positive,
+            help="split output into part files (name.part-0001.ext, ...) of at most N rows each, and a manifest",
+        )
+        g.add_argument(
+            "--max-bytes-per-file",
+            metavar="N",
+            type=positive,
+            help="split text output, except fmt and md, into part files of about N (uncompressed) bytes each, and a manifest",
+        )
+        g.add_argument(
+            "--width-sample",
+            metavar="N",
+            type=positive,
+            help="for tabular and markdown output, fix column widths from the first N rows and output rows as they arrive;"
+            " longer values are truncated",
+        )
+        g.add_argument(
+            "--buffer-size",
+            metavar="KB",
+            type=positive,
+            help=f"collect text output in chunks of about KB kilobytes before writing (default {BUFFER_SIZE // 1024})",
+        )
+
         return parser
+
+
+@dataclass(frozen=True)
+class Exporter:
+    "An ExportFn bound to a format and an output file (stdout if None)"
+
+    format: Format
+    file: Path | None = None
+    compress: Compression | None = None
+    columns: tuple[tuple[str, int | None, int | None] | None, ...] = ()  # type, precision and scale, for Parquet and Arrow
+    max_rows: int | None = None
+    max_bytes: int | None = None
+    compact: bool = False
+    width_sample: int | None = None
+    widths: tuple[int | None, ...] = ()  # column widths known from result metadata, used with width_sample
+    buffer_size: int | None = None
+
+    def __post_init__(self):
+        if self.max_rows is not None or self.max_bytes is not None:
+            if self.file is None:
+                raise ValueError("an output file is required to split output into parts")
+            # fmt and md hold all rows of a part, to size the columns, before writing any of them
+            if self.max_bytes is not None and (self.format.needs_file or self.format in (Format.FMT, Format.MD)):
+                raise ValueError(f"{self.format.arg_help()} output can only be split by number of rows")
+
+    def _output(self, file: Path | None) -> Path | OutputFile | None:
+        "output file, wrapped for compression if requested or implied by the file extension"
+        if self.format.needs_file or (compression := self.compress or Compression.from_path(file)) is None:
+            return file
+        return OutputFile(file, compression)
+
+    @property
+    def output(self) -> Path | OutputFile | None:
+        return self._output(self.file)
+
+    @property
+    def writer(self) -> Callable[[Data, list[str], list[type], Any], None]:
+        "format's row writer, with format specific options applied"
+        if self.compact and self.format is Format.JSON:
+            from . import json
+
+            writer = json.export_compact
+        elif self.width_sample is not None and self.format in (Format.FMT, Format.MD):
+            from . import fmt, md
+
+            write = fmt.write if self.format is Format.FMT else md.write
+            writer = textio(partial(write, sample=self.width_sample, widths=self.widths))
+        elif self.columns and self.format in (Format.PARQUET, Format.ARROW):
+            writer = partial(self.format._export, columns=self.columns)
+        else:
+            writer = self.format._export
+
+        if self.buffer_size is not None and self.format not in (Format.XLS, Format.PARQUET, Format.ARROW):  # text formats
+            return partial(writer, buffer_size=self.buffer_size)
+        return writer
+
+    def __call__(self, data: Data, headers: list[str], types: list[type]) -> None:
+        if self.max_rows is None and self.max_bytes is None:
+            return self.writer(data, headers, types, self.output)
+        return self._export_parts(data, headers, types)
+
+    def part(self, n: int, max_rows: int | None = None, max_bytes: int | None = None) -> Part:
+        "n-th part file of the output"
+        return Part(cast(Path | OutputFile, self._output(part_path(cast(Path, self.file), n))), max_rows, max_bytes)
+
+    def _export_parts(self, data: Data, headers: list[str], types: list[type]) -> None:
+        "write rows to a sequence of part files, each complete with its own headers, followed by a manifest"
+        path = cast(Path, self.file)
+        it = iter(data)
+        pending: Iterator[tuple[Any, ...]] = it
+        parts: list[dict[str, Any]] = []
+
+        while True:
+            part = self.part(len(parts) + 1, self.max_rows, self.max_bytes)
+            self.writer(part.feed(pending), headers, types, part.path if self.format.needs_file else part)
+            parts.append(part.entry())
+            if (row := next(it, None)) is None:
+                break
+            pending = chain([row], it)
+
+        write_manifest(path, parts)
+
+    @contextmanager
+    def sheets(self) -> Iterator[Callable[[str], ExportFn]]:
+        """yields a function that returns the ExportFn for a named result. In Excel format, each result is added as a
+        sheet, named after the result, of a single workbook; other formats export each result the same as before"""
+        if self.format is not Format.XLS or self.max_rows is not None:
+            yield lambda _: self
+            return
+
+        from . import xls
+
+        book = xls.workbook(cast(Path, self.file))
+
+        def sheet(name: str) -> ExportFn:
+            def export(data: Data, headers: list[str], types: list[type]) -> None:
+                xls.write_sheet(book, name, data, headers, types)
+
+            return export
+
+        try:
+            yield sheet
+        finally:
+            book.close()
+
+    @property
+    def arrow(self) -> ArrowExportFn | None:
+        "export function that accepts Arrow batches, or None if the format only supports rows"
+        if (fn := self.format._export_arrow) is None or self.max_rows is not None or self.max_bytes is not None:
+            return None
+
+        def wrapped(batches: ArrowData, headers: list[str], types: list[type]) -> None:
+            return fn(batches, headers, types, self.output)
+
+        return wrapped
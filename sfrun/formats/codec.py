@@ -0,0 +1,87 @@
+"""Per-column value converters shared by exporters.
+
+Type dispatch happens once per column, when an export starts, rather than once for every value. A converter of None
+means values of that column are used as-is.
+"""
+
+import datetime as dt
+import json
+import math
+from collections.abc import Callable, Iterable, Sequence
+from functools import partial
+from json.encoder import encode_basestring, encode_basestring_ascii  # type: ignore
+from typing import Any
+
+from ..util import Data
+
+Converter = Callable[[Any], Any]
+
+JSON_NATIVE = (str, int, float, bool)
+
+
+def text(t: type, null: str = "") -> Converter:
+    "render values as str() does, with null values rendered as `null`"
+    if issubclass(t, str):
+        return lambda v: null if v is None else v
+    return lambda v: null if v is None else str(v)
+
+
+def json_value(t: type) -> Converter | None:
+    "values that are native to JSON are left as-is, others are converted to strings; NaN and infinity become null"
+    if issubclass(t, float):
+        return lambda v: v if v is None or math.isfinite(v) else None
+    if issubclass(t, JSON_NATIVE):
+        return None
+    return lambda v: v if v is None or isinstance(v, JSON_NATIVE) else str(v)
+
+
+def _compact_float(v: float) -> str:
+    "float as orjson encodes it, with exponents such as 1e16 and 1e-7 instead of 1e+16 and 1e-07"
+    r = float.__repr__(v)
+    if "e" not in r:
+        return r
+    mantissa, exponent = r.split("e")
+    return f"{mantissa}e{int(exponent)}"
+
+
+def json_text(t: type, compact: bool = False) -> Converter:
+    """encode values as JSON text; types that have no JSON equivalent are encoded as strings. Compact text, the same as
+    orjson's, has no white space, non-ASCII characters as they are, and exponents such as 1e16"""
+    string = encode_basestring if compact else encode_basestring_ascii
+    dumps = partial(json.dumps, separators=(",", ":"), ensure_ascii=False) if compact else json.dumps
+    if issubclass(t, bool):
+        return lambda v: "null" if v is None else "true" if v else "false"
+    if issubclass(t, int):
+        return lambda v: "null" if v is None else int.__repr__(v)
+    if issubclass(t, float):
+        number = _compact_float if compact else json.dumps
+        return lambda v: "null" if v is None or not math.isfinite(v) else number(v)
+    if issubclass(t, str):
+        return lambda v: "null" if v is None else string(v) if isinstance(v, str) else dumps(v)
+    return lambda v: "null" if v is None else string(str(v))
+
+
+def naive(t: type) -> Converter | None:
+    "drop timezone from datetime and time values, for formats that don't support them, such as Excel"
+    if issubclass(t, (dt.datetime, dt.time)):
+        return lambda v: v if v is None or v.tzinfo is None else v.replace(tzinfo=None)
+    return None
+
+
+def map_rows(rows: Data, converters: Sequence[Converter | None]) -> Iterable[Sequence[Any]]:
+    "apply converters to each row; only columns with a converter are touched, and rows pass through if there are none"
+    convs = [(i, c) for i, c in enumerate(converters) if c is not None]
+    if not convs:
+        return rows
+
+    if len(convs) == len(converters):
+        fs = [c for _, c in convs]
+        return ([f(v) for f, v in zip(fs, row)] for row in rows)
+
+    def convert(row: tuple[Any, ...]) -> list[Any]:
+        r = list(row)
+        for i, c in convs:
+            r[i] = c(r[i])
+        return r
+
+    return map(convert, rows)
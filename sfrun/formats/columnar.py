@@ -0,0 +1,107 @@
+"save Arrow record batches column by column, without materializing Python values for each cell"
+
+import csv
+import io
+import json
+from functools import partial
+from typing import Any, BinaryIO
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ..util import ArrowData, binio
+
+_CONTROL_CHARS = {chr(c): f"\\u{c:04x}" for c in range(0x20)} | {"\b": "\\b", "\f": "\\f", "\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _is_text(t: pa.DataType) -> bool:
+    return pa.types.is_string(t) or pa.types.is_large_string(t)
+
+
+def as_text(col: Any) -> Any:
+    "render a column as strings, the same way str() renders equivalent Python values"
+    t = col.type
+    if _is_text(t):
+        return col
+    if pa.types.is_boolean(t):
+        return pc.if_else(col, "True", "False")
+    if pa.types.is_timestamp(t) or pa.types.is_time(t):
+        s = pc.replace_substring_regex(pc.cast(col, pa.string()), r"(\.\d{6})000", r"\1")
+        s = pc.replace_substring_regex(s, r"\.000000", "")
+        if getattr(t, "tz", None) is not None:  # Arrow renders offsets as Z or +hhmm; Python as +hh:mm
+            s = pc.replace_substring_regex(pc.replace_substring_regex(s, "Z$", "+00:00"), r"([+-]\d{2})(\d{2})$", r"\1:\2")
+        return s
+    try:
+        return pc.cast(col, pa.string())
+    except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+        return pa.array([None if v is None else str(v) for v in col.to_pylist()], pa.string())
+
+
+def _csv_quote(col: Any, sep: str) -> Any:
+    "quote values the same way as csv.QUOTE_MINIMAL"
+    needs_quote = pc.match_substring_regex(col, f'[{sep}"\\r\\n]')
+    quoted = pc.binary_join_element_wise('"', pc.replace_substring(col, '"', '""'), '"', "")
+    return pc.if_else(needs_quote, quoted, col)
+
+
+def _json_value(col: Any) -> Any:
+    "render a column as JSON literals; non-native types are quoted strings, as in the row-based JSON writers"
+    t = col.type
+    if pa.types.is_integer(t):
+        return pc.cast(col, pa.string())
+    if pa.types.is_floating(t):  # JSON has no NaN or infinity
+        return pc.if_else(pc.is_finite(col), pc.cast(col, pa.string()), None)
+    if pa.types.is_boolean(t):
+        return pc.if_else(col, "true", "false")
+
+    s = as_text(col)
+    s = pc.replace_substring(pc.replace_substring(s, "\\", "\\\\"), '"', '\\"')
+    if pc.any(pc.match_substring_regex(s, "[\\x00-\\x1f]")).as_py():
+        for c, esc in _CONTROL_CHARS.items():
+            s = pc.replace_substring(s, c, esc)
+    return pc.binary_join_element_wise('"', s, '"', "")
+
+
+def _lines(rows: Any, eol: str) -> bytes:
+    "concatenate an array of row strings into a single block of text"
+    rows = rows.combine_chunks() if isinstance(rows, pa.ChunkedArray) else rows
+    if len(rows) == 0:
+        return b""
+    block = pc.binary_join(pa.ListArray.from_arrays(pa.array([0, len(rows)], pa.int32()), rows), eol)
+    return (block[0].as_py() + eol).encode()
+
+
+def _join(cols: list[Any], sep: str, null: str) -> Any:
+    return pc.binary_join_element_wise(*cols, sep, null_handling="replace", null_replacement=null)
+
+
+def export(batches: ArrowData, headers: list[str], types: list[type], output: BinaryIO, sep: str = ",") -> None:
+    "export Arrow batches in CSV format"
+    hdr = io.StringIO()
+    csv.writer(hdr, delimiter=sep).writerow(headers)
+    output.write(hdr.getvalue().encode())
+
+    for b in batches:
+        cols = [_csv_quote(as_text(c), sep) if _is_text(c.type) else as_text(c) for c in b.columns]
+        output.write(_lines(_join(cols, sep, ""), "\r\n"))
+
+
+csv_export = binio(partial(export, sep=","))
+tsv_export = binio(partial(export, sep="\t"))
+
+
+@binio
+def raw_export(batches: ArrowData, headers: list[str], types: list[type], output: BinaryIO) -> None:
+    "export Arrow batches in raw format (textual, tab delimited)"
+    output.writelines(_lines(_join([as_text(c) for c in b.columns], "\t", "None"), "\n") for b in batches)
+
+
+@binio
+def jsonl_export(batches: ArrowData, headers: list[str], types: list[type], output: BinaryIO) -> None:
+    "export Arrow batches as JSON lines"
+    keys = [json.dumps(h) + ": " for h in headers]
+    for b in batches:
+        parts: list[Any] = []
+        for e, (k, c) in enumerate(zip(keys, b.columns)):
+            parts += [("{" if e == 0 else ", ") + k, pc.fill_null(_json_value(c), "null")]
+        output.write(_lines(pc.binary_join_element_wise(*parts, "}", ""), "\n"))
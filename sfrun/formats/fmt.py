@@ -1,13 +1,38 @@
 """save output of SQL as CSV"""
 
-from typing import Optional, TextIO
+from collections.abc import Sequence
+from itertools import chain
+from typing import TextIO
 
 from yappt import tabulate
+from yappt.grid import iter_with_grid
+from yappt.tabulate import formatted_seq_iter
 
 from ..util import Data, textio
+from .widths import aligned_iter
 
 
-@textio
-def export(rows: Data, headers: list[str], types: list[type], file: TextIO) -> None:
-    "export formatted data"
-    tabulate(rows, headers=headers, types=[Optional[t] for t in types], file=file)  # type: ignore
+def write(
+    rows: Data,
+    headers: list[str],
+    types: list[type],
+    file: TextIO,
+    sample: int | None = None,
+    widths: Sequence[int | None] = (),
+) -> None:
+    """export formatted data; with sample, column widths are fixed from the first sample rows (and widths known from
+    metadata), after which rows are output as they arrive"""
+    if sample is None:
+        tabulate(rows, headers=headers, types=[t | None for t in types], file=file)  # type: ignore
+        return
+
+    it = iter(rows)
+    empty = (first := next(it, None)) is None
+
+    cols, fseq = formatted_seq_iter(it if empty else chain([first], it), [t | None for t in types], headers)  # type: ignore
+    aseq = aligned_iter(chain([[c.title for c in cols]], fseq), [c.alignment for c in cols], sample, widths)
+    for line in iter_with_grid(aseq, num_headers=0 if empty else 1):  # a box of just the headers if there are no rows
+        print(line, file=file)
+
+
+export = textio(write)
@@ -0,0 +1,48 @@
+"save SQL result-set as an Arrow IPC stream"
+
+from typing import BinaryIO
+
+import pyarrow as pa
+
+from ..util import ArrowData, Data, binio
+from .parquet import Column, arrow_type, to_array, typed_chunks
+
+BATCH_SIZE = 65_536
+
+
+def _empty_schema(headers: list[str], types: list[type]) -> pa.Schema:
+    return pa.schema(pa.field(h, arrow_type(t)) for h, t in zip(headers, types))
+
+
+@binio
+def export(rows: Data, headers: list[str], types: list[type], output: BinaryIO, columns: tuple[Column | None, ...] = ()) -> None:
+    """export rows as an Arrow IPC stream, a record batch at a time; the schema is derived from types and columns,
+    metadata of each column, if known (see parquet.typed_chunks)"""
+    schema, chunks = typed_chunks(rows, headers, types, columns, BATCH_SIZE)
+    with pa.ipc.new_stream(output, schema) as writer:
+        for chunk in chunks:
+            cols = list(zip(*chunk))
+            writer.write_batch(pa.record_batch([to_array(c, f.type) for c, f in zip(cols, schema)], schema=schema))
+            output.flush()  # make each batch available to the reader as soon as it is written
+
+
+@binio
+def export_arrow(batches: ArrowData, headers: list[str], types: list[type], output: BinaryIO) -> None:
+    "export Arrow batches as an Arrow IPC stream, keeping Arrow types as fetched"
+    writer: pa.ipc.RecordBatchStreamWriter | None = None
+    schema = _empty_schema(headers, types)
+
+    try:
+        for b in batches:
+            b = b.rename_columns(headers)
+            if writer is None:
+                schema = b.schema
+                writer = pa.ipc.new_stream(output, schema)
+            writer.write_table(b.cast(schema))
+            output.flush()
+
+        if writer is None:
+            writer = pa.ipc.new_stream(output, schema)
+    finally:
+        if writer is not None:
+            writer.close()
@@ -1,33 +1,67 @@
 "save SQL result-set in JSON format"
 
-import json
-from typing import Any, Iterable, TextIO
-
-from yappt import iter_more
+from functools import partial
+from itertools import islice
+from json.encoder import encode_basestring, encode_basestring_ascii  # type: ignore
+from typing import Any, Callable, Iterable, Sequence, TextIO
 
 from ..util import Data, textio
+from .codec import json_text, json_value, map_rows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BUFFER_ROWS = 1000
+
+
+def iter_row(rows: Data, headers: list[str], types: list[type]) -> Iterable[dict[str, Any]]:
+    "rows as dicts of values that JSON can represent"
+    yield from (dict(zip(headers, row)) for row in map_rows(rows, [json_value(t) for t in types]))
+
+
+def _write(rows: Data, fmt_row: Callable[[Sequence[Any]], str], output: TextIO) -> None:
+    "write rows, formatted as JSON objects, as an array; rows are buffered and written in chunks"
+    it = iter(rows)
+    output.write("[")
+    first = True
+    while chunk := list(islice(it, BUFFER_ROWS)):
+        output.write(("\n" if first else ",\n") + ",\n".join(map(fmt_row, chunk)))
+        first = False
+    output.write("\n]\n")
+
+
+def write(rows: Data, headers: list[str], types: list[type], output: TextIO, compact: bool = False) -> None:
+    """export rows as JSON array; each object is on its own line in compact mode, and indented otherwise. Compact
+    output is the same whether or not orjson is installed"""
+    # as in a dict of the row, the value of a repeated header is the last one, at the position of the first
+    cols = list({h: e for e, h in enumerate(headers)}.items())
+
+    if compact:
+        encoders = [(encode_basestring(h) + ":", i, json_text(types[i], compact=True)) for h, i in cols]
+
+        def fmt_compact(row: Sequence[Any]) -> str:
+            return "{" + ",".join(k + e(row[i]) for k, i, e in encoders) + "}"
 
+        if orjson is None:
+            return _write(rows, fmt_compact, output)
 
-def iter_row(rows: Data, headers: list[str]) -> Iterable[dict[str, Any]]:
-    def to_json(v: Any) -> str | int | float | bool | None:
-        return v if v is None or isinstance(v, str | int | float | bool) else str(v)
+        def fmt_orjson(row: Sequence[Any]) -> str:
+            try:
+                return orjson.dumps(dict(zip(headers, row)), default=str, option=orjson.OPT_PASSTHROUGH_DATETIME).decode()
+            except orjson.JSONEncodeError:  # integers beyond 64 bits
+                return fmt_compact(row)
 
-    def as_dict(xs: Iterable[tuple[str, Any]]) -> dict[str, Any]:
-        return {h: to_json(v) for h, v in xs}
+        return _write(rows, fmt_orjson, output)
 
-    yield from (as_dict(zip(headers, row)) for row in rows)
+    indented = [("    " + encode_basestring_ascii(h) + ": ", i, json_text(types[i])) for h, i in cols]
 
+    def fmt_indented(row: Sequence[Any]) -> str:
+        return "  {\n" + ",\n".join(k + e(row[i]) for k, i, e in indented) + "\n  }"
 
-def as_json_array(rows: Iterable[dict[str, Any]]) -> Iterable[str]:
-    yield "["
-    for more, row in iter_more(rows):
-        doc = "\n".join("  " + y for y in json.dumps(row, indent=2).splitlines())
-        yield doc + ("," if more else "")
-    yield "]"
+    _write(rows, fmt_indented, output)
 
 
-@textio
-def export(rows: Data, headers: list[str], types: list[type], output: TextIO) -> None:
-    """export rows as JSON"""
-    for x in as_json_array(iter_row(rows, headers)):
-        print(x, file=output)
+export = textio(write)
+export_compact = textio(partial(write, compact=True))
@@ -10,5 +10,4 @@ from .json import iter_row
 @textio
 def export(rows: Data, headers: list[str], types: list[type], output: TextIO) -> None:
     """export rows as JSON"""
-    for x in iter_row(rows, headers):
-        print(json.dumps(x), file=output)
+    output.writelines(json.dumps(x) + "\n" for x in iter_row(rows, headers, types))
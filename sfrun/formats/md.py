@@ -1,17 +1,24 @@
 "save SQL result-set in markdown table format"
 
 from itertools import chain
-from typing import Iterable, TextIO
+from typing import Iterable, Sequence, TextIO
 
 from yappt.tabulate import aligned_seq_iter, formatted_seq_iter
 from yappt.types import HAlign
 
 from ..util import Data, textio
+from .widths import aligned_iter
 
 
-@textio
-def export(rows: Data, headers: list[str], types: list[type], output: TextIO) -> None:
-    """export rows with given metadata"""
+def write(
+    rows: Data,
+    headers: list[str],
+    types: list[type],
+    output: TextIO,
+    sample: int | None = None,
+    widths: Sequence[int | None] = (),
+) -> None:
+    """export rows with given metadata; with sample, column widths are fixed from the first sample rows"""
 
     def emit(xs: Iterable[str]) -> None:
         print("| " + " | ".join(xs) + " |", file=output)
@@ -25,9 +32,14 @@ def export(rows: Data, headers: list[str], types: list[type], output: TextIO) ->
 
     meta, fseq = formatted_seq_iter(rows, types, headers)
     alignments = [m.alignment for m in meta]
-    aseq = aligned_seq_iter(chain([[m.title for m in meta]], fseq), alignments)
+    titled = chain([[m.title for m in meta]], fseq)
+    aseq = aligned_seq_iter(titled, alignments) if sample is None else aligned_iter(titled, alignments, sample, widths)
 
-    for e, r in enumerate(aseq):
-        if e == 1:
-            emit(separator(a, w) for a, w in zip(alignments, map(len, r)))
+    it = iter(aseq)
+    emit(header := next(it))  # headers are aligned to the same widths as the rows, and are output even if there are none
+    emit(separator(a, w) for a, w in zip(alignments, map(len, header)))
+    for r in it:
         emit(r)
+
+
+export = textio(write)
@@ -0,0 +1,108 @@
+"save SQL result-set in Parquet format"
+
+import datetime as dt
+from collections.abc import Iterable, Iterator
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..util import ArrowData, Data
+
+ROW_GROUP_SIZE = 100_000
+
+Column = tuple[str, int | None, int | None]  # Snowflake type, precision and scale of a column, from result metadata
+ZONED = ("TIMESTAMP_LTZ", "TIMESTAMP_TZ")
+
+
+def guessed(t: type, column: Column | None) -> bool:
+    "True if the Arrow type of a column of Python type t depends on its values, as there is no column metadata"
+    return column is None and issubclass(t, (Decimal, dt.datetime))
+
+
+def arrow_type(t: type, column: Column | None = None, values: Iterable[Any] = ()) -> pa.DataType:
+    """Arrow type for a column of Python type t. Column metadata, if known, sets precision and scale of decimals, and
+    integers that may not fit in 64 bits, and whether timestamps have a timezone; otherwise, these are taken from
+    values, which must be all values of the column"""
+    name, precision, scale = column or ("", None, None)
+
+    if issubclass(t, bool):
+        return pa.bool_()
+    if issubclass(t, int):
+        return pa.decimal128(precision, 0) if name == "FIXED" and precision is not None and precision > 18 else pa.int64()
+    if issubclass(t, float):
+        return pa.float64()
+    if issubclass(t, Decimal):
+        if name == "FIXED" and precision is not None:
+            return pa.decimal128(precision, scale or 0)
+        exponents = (v.as_tuple().exponent for v in values if isinstance(v, Decimal))
+        return pa.decimal128(38, max((-e for e in exponents if isinstance(e, int) and e < 0), default=0))
+    if issubclass(t, dt.datetime):
+        if name.startswith("TIMESTAMP"):
+            zoned = name in ZONED
+        else:
+            zoned = any(isinstance(v, dt.datetime) and v.tzinfo is not None for v in values)
+        return pa.timestamp("us", tz="UTC" if zoned else None)
+    if issubclass(t, dt.date):
+        return pa.date32()
+    if issubclass(t, dt.time):
+        return pa.time64("us")
+    if issubclass(t, (bytes, bytearray)):
+        return pa.binary()
+    return pa.string()
+
+
+def to_array(values: tuple[Any, ...], t: pa.DataType) -> pa.Array:
+    "Arrow array of type t from a column of Python values"
+    if pa.types.is_string(t):
+        values = tuple(v if v is None or isinstance(v, str) else str(v) for v in values)
+    elif pa.types.is_time(t):
+        values = tuple(v if v is None or v.tzinfo is None else v.replace(tzinfo=None) for v in values)
+    return pa.array(values, type=t)
+
+
+def typed_chunks(
+    rows: Data, headers: list[str], types: list[type], columns: tuple[Column | None, ...], size: int
+) -> tuple[pa.Schema, Iterator[list[tuple[Any, ...]]]]:
+    """schema of rows, from types and column metadata (see arrow_type), and the rows in chunks of up to size rows.
+    Columns whose type depends on their values, for lack of metadata, are typed by all of them, so that a later chunk
+    doesn't need a wider type than the first; rows are then read in full before the first chunk"""
+    columns = columns or (None,) * len(types)
+    it = iter(rows)
+    values: list[Iterable[Any]] = [()] * len(types)
+    if any(guessed(t, c) for t, c in zip(types, columns)):
+        data = list(it)
+        it = iter(data)
+        values = [[r[e] for r in data] if guessed(t, c) else () for e, (t, c) in enumerate(zip(types, columns))]
+    schema = pa.schema(pa.field(h, arrow_type(t, c, v)) for h, t, c, v in zip(headers, types, columns, values))
+    return schema, iter(lambda: list(islice(it, size)), [])
+
+
+def export(rows: Data, headers: list[str], types: list[type], file: Path, columns: tuple[Column | None, ...] = ()) -> None:
+    "export data in Parquet format, writing a row group at a time; columns, if known, are metadata of each column"
+    schema, chunks = typed_chunks(rows, headers, types, columns, ROW_GROUP_SIZE)
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in chunks:
+            cols = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays([to_array(c, f.type) for c, f in zip(cols, schema)], schema=schema))
+
+
+def export_arrow(batches: ArrowData, headers: list[str], types: list[type], file: Path) -> None:
+    "export Arrow batches in Parquet format, keeping Arrow types as fetched"
+    writer: pq.ParquetWriter | None = None
+
+    try:
+        for b in batches:
+            b = b.rename_columns(headers)
+            if writer is None:
+                writer = pq.ParquetWriter(file, b.schema)
+            writer.write_table(b.cast(writer.schema))
+
+        if writer is None:
+            writer = pq.ParquetWriter(file, pa.schema(pa.field(h, arrow_type(t)) for h, t in zip(headers, types)))
+    finally:
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,95 @@
+"split an export into multiple part files, with a manifest listing them"
+
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Self
+
+from ..compress import Compression, OutputFile
+from ..sink import BUFFER_SIZE, Sink, open_sink
+from ..util import Data
+
+
+def part_path(path: Path, n: int) -> Path:
+    "name.ext[.compression] -> name.part-NNNN.ext[.compression]"
+    extra = path.suffix if Compression.from_path(path) is not None else ""
+    base = path.with_suffix("") if extra else path
+    return base.with_name(f"{base.stem}.part-{n:04d}{base.suffix}{extra}")
+
+
+def manifest_path(path: Path) -> Path:
+    extra = path.suffix if Compression.from_path(path) is not None else ""
+    base = path.with_suffix("") if extra else path
+    return base.with_name(f"{base.stem}.manifest.json")
+
+
+class CountingFile:
+    "proxy to an open file that counts (uncompressed) bytes written"
+
+    def __init__(self, f: IO[Any]):
+        self.f = f
+        self.bytes_written = 0
+
+    def write(self, s: str | bytes) -> int:
+        self.bytes_written += len(s) if isinstance(s, bytes) or s.isascii() else len(s.encode())
+        return self.f.write(s)  # type: ignore
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.f, name)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.f.close()
+
+
+@dataclass
+class Part:
+    "one part file; open() or sink() is called by the format writer, feed() yields rows until the part is full"
+
+    output: Path | OutputFile
+    max_rows: int | None = None
+    max_bytes: int | None = None
+    rows: int = 0
+    file: Sink | CountingFile | None = field(default=None, repr=False)
+
+    @property
+    def path(self) -> Path:
+        return self.output if isinstance(self.output, Path) else self.output.path  # type: ignore
+
+    @property
+    def bytes(self) -> int:
+        return self.file.bytes_written if self.file is not None else self.path.stat().st_size
+
+    def open(self, mode: str = "w") -> CountingFile:
+        self.file = CountingFile(self.output.open(mode))
+        return self.file
+
+    def sink(self, buffer_size: int = BUFFER_SIZE) -> Sink:
+        self.file = open_sink(self.output, buffer_size)
+        return self.file
+
+    def full(self) -> bool:
+        return (self.max_rows is not None and self.rows >= self.max_rows) or (
+            self.max_bytes is not None and self.file is not None and self.file.bytes_written >= self.max_bytes
+        )
+
+    def entry(self) -> dict[str, Any]:
+        "manifest entry for this part"
+        return {"file": self.path.name, "rows": self.rows, "bytes": self.bytes}
+
+    def feed(self, it: Iterator[tuple[Any, ...]]) -> Data:
+        "yield rows from it until this part is full; a row is not taken from it unless it will be written"
+        while not self.full():
+            if (row := next(it, None)) is None:
+                return
+            self.rows += 1
+            yield row
+
+
+def write_manifest(path: Path, parts: list[dict[str, Any]]) -> None:
+    "write manifest listing, in order, part files created for the output path"
+    manifest = {"rows": sum(p["rows"] for p in parts), "parts": parts}
+    manifest_path(path).write_text(json.dumps(manifest, indent=2) + "\n")
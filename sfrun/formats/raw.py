@@ -1,10 +1,10 @@
 from typing import TextIO
 
 from ..util import Data, textio
+from .codec import map_rows, text
 
 
 @textio
 def export(rows: Data, headers: list[str], types: list[type], file: TextIO) -> None:
     """export data in raw format (textual, tab delimited)"""
-    for r in rows:
-        print("\t".join(str(c) for c in r), file=file)
+    file.writelines("\t".join(r) + "\n" for r in map_rows(rows, [text(t, null="None") for t in types]))
@@ -0,0 +1,42 @@
+"align formatted rows to column widths that are fixed up front, so that rows can be output as they arrive"
+
+from collections.abc import Iterable, Sequence
+from itertools import chain, islice, zip_longest
+
+from yappt.types import HAlign
+
+ELLIPSIS = "…"
+MAX_HINT = 20  # widths known from column metadata are used only if they are narrow; e.g. not for VARCHAR(16777216)
+
+
+def splitcols(row: Sequence[str]) -> Iterable[Sequence[str]]:
+    "split a row with multi-line values into as many rows as there are lines"
+    return zip_longest(*(col.split("\n") for col in row), fillvalue="")
+
+
+def fit(v: str, width: int) -> str:
+    "truncate values that are wider than the column width"
+    if len(v) <= width:
+        return v
+    return v[: width - 1] + ELLIPSIS if width > 0 else ""
+
+
+def aligned_iter(
+    rows: Iterable[Sequence[str]],
+    alignments: list[HAlign],
+    sample: int,
+    hints: Sequence[int | None] = (),
+) -> Iterable[list[str]]:
+    """similar to yappt's aligned_seq_iter, but only the header (first) row and the following sample rows are buffered.
+    Column widths are fixed from them, and from hints (widths known from metadata); longer values are truncated"""
+    it = iter(rows)
+    buffered = [y for x in islice(it, sample + 1) for y in splitcols(x)]
+    if not buffered:
+        return
+
+    widths = [
+        max(max(map(len, c)), h if h is not None and h <= MAX_HINT else 0)
+        for c, h in zip_longest(zip(*buffered), hints[: len(alignments)])
+    ]
+    for r in chain(buffered, (y for x in it for y in splitcols(x))):
+        yield [a.align(fit(c, w), w) for a, w, c in zip(alignments, widths, r)]
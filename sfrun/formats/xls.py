@@ -1,75 +1,179 @@
 "save SQL result-set in Excel format"
 
 import datetime as dt
+import re
 from decimal import Decimal
+from itertools import chain, islice
 from pathlib import Path
-from typing import Any, Iterable, Optional, TypeVar
+from typing import Any, Callable, Iterable, Protocol, Sequence
 
 from openpyxl import Workbook
 from openpyxl.cell import Cell, WriteOnlyCell  # type: ignore
-from openpyxl.styles import Font
+from openpyxl.styles import Font, NamedStyle
 from openpyxl.utils import get_column_letter  # type: ignore
 
-T = TypeVar("T")
+from .codec import map_rows, naive
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+FONT = "Hack"
+MAX_ROWS = 1_048_576  # Excel's limit, including the header row
+AppendFn = Callable[[Sequence[Any]], None]
+
+
+def sheet_title(name: str, taken: set[str]) -> str:
+    "valid and unique (Excel compares them case insensitively) sheet title derived from name"
+    base = re.sub(r"[\[\]:*?/\\]", "_", name).strip("'") or "Sheet"
+    title, n = base[:31], 1
+    while title.lower() in taken:
+        n += 1
+        suffix = f" ({n})"
+        title = base[: 31 - len(suffix)] + suffix
+    taken.add(title.lower())
+    return title
+
+
+def num_fmt(t: type) -> str:
+    "Return numbering format from type"
+    if issubclass(t, bool):
+        return "General"
+    if issubclass(t, int):
+        return "#,##0"
+    if issubclass(t, (float, Decimal)):
+        return "#,##0.00"
+    if issubclass(t, dt.datetime):
+        return "yyyy-mm-dd hh:mm:ss"
+    if issubclass(t, dt.date):
+        return "yyyy-mm-dd"
+    if issubclass(t, dt.time):
+        return "hh:mm:ss"
+    return "General"
+
+
+class Book(Protocol):
+    def sheet(self, title: str, headers: list[str], types: list[type]) -> AppendFn: ...
+    def close(self) -> None: ...
+
+
+class OpenpyxlBook:
+    """openpyxl write-only workbook. Each column has a named style, and a single styled cell per column is reused for
+    every row, since write-only worksheets serialize rows as they are appended"""
+
+    def __init__(self, file: Path):
+        self.file = file
+        self.wb = Workbook(write_only=True)
+        self.wb.iso_dates = True
+        self.styles: dict[str, str] = {}
+        self.header = NamedStyle("sfrun header", font=Font(FONT, bold=True))
+        self.wb.add_named_style(self.header)
+        self.titles: set[str] = set()
+
+    def style(self, fmt: str) -> str:
+        if (name := self.styles.get(fmt)) is None:
+            name = self.styles[fmt] = f"sfrun {len(self.styles)}"
+            self.wb.add_named_style(NamedStyle(name, font=Font(FONT), number_format=fmt))
+        return name
+
+    def sheet(self, title: str, headers: list[str], types: list[type]) -> AppendFn:
+        ws = self.wb.create_sheet(sheet_title(title, self.titles))  # type: ignore
+        ws.freeze_panes = "A2"  # type: ignore
+        ws.auto_filter.ref = "A1:{}1".format(get_column_letter(len(headers)))  # type: ignore
+
+        def styled(style: str, value: Any = None) -> Cell:
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            return cell
+
+        ws.append([styled(self.header.name, h) for h in headers])  # type: ignore
+        cells = [styled(self.style(num_fmt(t))) for t in types]
+
+        def append(row: Sequence[Any]) -> None:
+            out: list[Cell | None] = []
+            for c, v in zip(cells, row):
+                if v is None:
+                    out.append(None)
+                else:
+                    c.value = v
+                    out.append(c)
+            ws.append(out)  # type: ignore
+
+        return append
+
+    def close(self) -> None:
+        with self.file.open("wb") as f:
+            self.wb.save(f)  # type: ignore
+
+
+class XlsxwriterBook:
+    "xlsxwriter workbook in constant memory mode; data cells are written without a format and take their column's format"
+
+    def __init__(self, file: Path):
+        self.wb = xlsxwriter.Workbook(  # type: ignore
+            str(file),
+            {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False, "nan_inf_to_errors": True},
+        )
+        self.formats: dict[str, Any] = {}
+        self.header = self.wb.add_format({"font_name": FONT, "bold": True})
+        self.titles: set[str] = set()
+
+    def format(self, fmt: str) -> Any:
+        if (f := self.formats.get(fmt)) is None:
+            f = self.formats[fmt] = self.wb.add_format({"font_name": FONT, "num_format": fmt})
+        return f
+
+    def sheet(self, title: str, headers: list[str], types: list[type]) -> AppendFn:
+        ws = self.wb.add_worksheet(sheet_title(title, self.titles))
+        for e, t in enumerate(types):
+            ws.set_column(e, e, None, self.format(num_fmt(t)))
+        ws.write_row(0, 0, headers, self.header)
+        ws.freeze_panes(1, 0)
+        ws.autofilter(0, 0, 0, max(len(headers) - 1, 0))
+
+        row_num = 0
+
+        def append(row: Sequence[Any]) -> None:
+            nonlocal row_num
+            row_num += 1
+            ws.write_row(row_num, 0, row)
+
+        return append
+
+    def close(self) -> None:
+        self.wb.close()
+
+
+def workbook(file: Path) -> Book:
+    "a new workbook, using xlsxwriter if it is installed, or openpyxl otherwise"
+    return XlsxwriterBook(file) if xlsxwriter is not None else OpenpyxlBook(file)
+
+
+def write_sheet(
+    book: Book,
+    title: str,
+    rows: Iterable[Sequence[Any]],
+    headers: list[str],
+    types: list[type],
+    max_rows: int = MAX_ROWS,
+) -> None:
+    "add a sheet with rows; rows that don't fit in a sheet continue on additional sheets, titled 'title (2)' etc."
+    # Excel doesn't support timezones
+    it = iter(map_rows(rows, [naive(t) for t in types]))
+    pending: Iterable[Sequence[Any]] = it
+
+    while True:
+        append = book.sheet(title, headers, types)
+        for row in islice(pending, max_rows - 1):
+            append(row)
+        if (row := next(it, None)) is None:
+            break
+        pending = chain([row], it)
 
 
 def export(rows: Iterable[tuple[Any, ...]], headers: list[str], types: list[type], file: Path) -> None:
     "export data in MS Excel (xlsx) format write to given file"
-
-    def num_fmt(t: type) -> str:
-        "Return numbering format from type"
-        if issubclass(t, int):
-            return "#,##0"
-        if issubclass(t, (float, Decimal)):
-            return "#,##0.00"
-        if issubclass(t, dt.datetime):
-            return "yyyy-mm-dd hh:mm:ss"
-        if issubclass(t, dt.date):
-            return "yyyy-mm-dd"
-        if issubclass(t, dt.time):
-            return "hh:mm:ss"
-        return ""
-
-    col_numfmt = [num_fmt(t) for t in types]
-
-    wb = Workbook(write_only=True)
-    wb.iso_dates = True
-    ws = wb.create_sheet()  # type: ignore
-
-    hdr_font, data_font = Font("Hack", bold=True), Font("Hack")
-
-    def hdr_cell(val: str) -> Cell:
-        "Formatted cell containing column title"
-        cell = WriteOnlyCell(ws, value=val)
-        cell.font = hdr_font
-        return cell
-
-    def data_cell(val: Optional[Any], num_fmt: Optional[str]) -> Optional[Cell]:
-        "Formatted cell containing data value"
-        if val is None:
-            return None
-        cell = WriteOnlyCell(ws, value=val)
-        cell.font = data_font
-        if num_fmt is not None:
-            cell.number_format = num_fmt
-        return cell
-
-    ws.freeze_panes = "A2"  # type: ignore
-    ws.auto_filter.ref = "A1:{}1".format(get_column_letter(len(headers)))  # type: ignore
-
-    def unset_tz(x: T) -> T:
-        "Removes timezone info from instances of datetime or time, since Excel doesn't support them"
-        if isinstance(x, dt.datetime):
-            return x if x.tzinfo is None else x.replace(tzinfo=None)
-        if isinstance(x, dt.time):
-            return x if x.tzinfo is None else x.replace(tzinfo=None)
-        return x
-
-    ws.append([hdr_cell(v) for v in headers])  # type: ignore
-    rows = (tuple(unset_tz(c) for c in row) for row in rows)
-
-    for row in rows:
-        ws.append([data_cell(v, f) for v, f in zip(row, col_numfmt)])  # type: ignore
-
-    with file.open("wb") as f:
-        wb.save(f)  # type: ignore
+    book = workbook(file)
+    write_sheet(book, "Sheet1", rows, headers, types)
+    book.close()
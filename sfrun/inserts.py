@@ -0,0 +1,49 @@
+"Coalesce runs of INSERT ... VALUES statements into the same table into multi-row inserts"
+
+import re
+from collections.abc import Iterable, Iterator
+from typing import TypeVar, cast
+
+T = TypeVar("T")
+
+MAX_ROWS = 1000  # per coalesced insert; Snowflake allows up to 16,384 rows in a VALUES clause
+MAX_CHARS = 512 * 1024  # of a coalesced insert; Snowflake limits the size of statement text
+
+NAME = r'(?:[\w$]+|"[^"]*")'
+INSERT = re.compile(
+    rf"\s*insert\s+into\s+({NAME}(?:\s*\.\s*{NAME})*\s*(?:\([^()]*\))?)\s*values\s*(\(.*\))\s*;?\s*",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def split(sql: str) -> tuple[str, str] | None:
+    """split an `INSERT INTO table [(columns)] VALUES (...)[, (...)]` statement into the table (and columns), and the
+    rows; None if the statement is not such an insert"""
+    if (m := INSERT.fullmatch(sql)) is None:
+        return None
+    return m[1].rstrip(), m[2]
+
+
+def target(sql: str) -> str | None:
+    "table and columns, with white space normalized, of an insert that can be coalesced; None for other statements"
+    return None if (parts := split(sql)) is None else re.sub(r"\s+", " ", parts[0])
+
+
+def chunks(stmts: Iterable[tuple[T, str]], max_rows: int = MAX_ROWS, max_chars: int = MAX_CHARS) -> Iterator[list[tuple[T, str]]]:
+    "split (numbered) statements into lists of up to max_rows statements that are, together, no longer than max_chars"
+    chunk: list[tuple[T, str]] = []
+    size = 0
+    for s in stmts:
+        if chunk and (len(chunk) == max_rows or size + len(s[1]) > max_chars):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(s)
+        size += len(s[1])
+    if chunk:
+        yield chunk
+
+
+def coalesce(sqls: list[str]) -> str:
+    "single insert of rows of all statements, which are inserts with the same target"
+    parts = [cast(tuple[str, str], split(s)) for s in sqls]
+    return f"insert into {parts[0][0]} values\n" + ",\n".join(rows for _, rows in parts)
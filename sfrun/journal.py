@@ -0,0 +1,42 @@
+"Journal of completed statements, which lets an interrupted batch run resume where it stopped"
+
+import hashlib
+import json
+from pathlib import Path
+from threading import Lock
+
+
+def digest(sql: str) -> str:
+    return hashlib.sha256(sql.strip().encode()).hexdigest()
+
+
+class Journal:
+    """append-only record, as JSON lines, of statements that completed: script, statement number (from 1) and a hash
+    of the statement text. With resume, entries of the existing journal are loaded and new entries are added to it"""
+
+    def __init__(self, path: Path, resume: bool = False):
+        self.done: set[tuple[str, int, str]] = set()
+        text = path.read_text() if resume and path.exists() else ""
+        for line in text.splitlines():
+            try:
+                e = json.loads(line)
+                self.done.add((e["script"], e["statement"], e["hash"]))
+            except (json.JSONDecodeError, KeyError, TypeError):  # e.g. a line cut short when the run was killed
+                continue
+        self.file = path.open("a" if resume else "w")
+        if text and not text.endswith("\n"):
+            self.file.write("\n")  # new entries start on a line of their own
+        self.lock = Lock()
+
+    def completed(self, script: str, n: int, sql: str) -> bool:
+        "True if the journal has an entry for the statement, and the statement didn't change since"
+        return (script, n, digest(sql)) in self.done
+
+    def record(self, script: str, n: int, sql: str) -> None:
+        entry = {"script": script, "statement": n, "hash": digest(sql)}
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
@@ -2,29 +2,95 @@
 
 import sys
 from argparse import ArgumentParser, ArgumentTypeError
+from dataclasses import replace
 from pathlib import Path
 from typing import Any
 
 from sfconn import with_connection_args
 
-from .df import main_py
-from .formats import Format
+from .cache import ResultCache, default_dir
+from .compress import Compression
+from .formats import Exporter, Format
 from .sql import main_sql
-from .util import SOFT_LIMIT, Command, __version__, natural
-
-
-def main(input: list[Path], file: list[Path], table: list[str], query: list[str], fn: str, **kwargs: Any) -> None:
+from .util import SOFT_LIMIT, Command, __version__, natural, positive
+
+
+def main(
+    input: list[Path],
+    file: list[Path],
+    table: list[str],
+    query: list[str],
+    fn: str,
+    columnar: bool,
+    parallel: int,
+    download_threads: int,
+    workers: int,
+    cache_ttl: int | None,
+    cache_dir: Path,
+    cache_size: int,
+    export: Exporter,
+    compress: Compression | None,
+    max_rows_per_file: int | None,
+    max_bytes_per_file: int | None,
+    compact: bool,
+    width_sample: int | None,
+    buffer_size: int | None,
+    **kwargs: Any,
+) -> None:
     "script entry-point"
-    sqls = [f.read_text() for f in (input + file) if f.suffix != ".py"] + [f"select * from {t}" for t in table] + query
+    try:
+        export = replace(
+            export,
+            compress=compress,
+            max_rows=max_rows_per_file,
+            max_bytes=max_bytes_per_file,
+            compact=compact,
+            width_sample=width_sample,
+            buffer_size=buffer_size * 1024 if buffer_size is not None else None,
+        )
+    except ValueError as err:
+        raise SystemExit(str(err))
+
+    if workers > 1:
+        if export.file is None:
+            raise SystemExit("--workers requires an output file")
+        if kwargs.get("limit"):
+            raise SystemExit("--workers exports the complete result and cannot be used with --limit")
+        if export.format is Format.XLS and export.max_rows is None:
+            raise SystemExit("--workers cannot be used with --xls, which writes all results to a single workbook")
+        if cache_ttl:
+            raise SystemExit("--workers cannot be used with --cache-ttl, cached results are not exported in parts")
+        kwargs["limit"] = 0
+
+    # columnar results are not saved, and rows cached by an earlier run are not served in their place
+    cache = None if not cache_ttl or columnar else ResultCache(cache_dir, ttl=cache_ttl, max_size=cache_size * 1024 * 1024)
+
+    sql_files = [f for f in (input + file) if f.suffix != ".py"]
+    sqls = [f.read_text() for f in sql_files] + [f"select * from {t}" for t in table] + query
+    names = [f.stem for f in sql_files] + table + [f"Query {e}" for e in range(1, len(query) + 1)]
+    pushdown = [False] * len(sql_files) + [True] * len(table) + [False] * len(query)
     pys = [f for f in (input + file) if f.suffix == ".py"]
     if not sqls and not pys:
-        sqls = [sys.stdin.read()]
+        sqls, names, pushdown = [sys.stdin.read()], ["Query 1"], [False]
 
     if sqls:
-        main_sql(sqls=sqls, **kwargs)
+        main_sql(
+            sqls=sqls,
+            names=names,
+            pushdown=pushdown,
+            export=export,
+            columnar=columnar,
+            parallel=parallel,
+            download_threads=download_threads,
+            workers=workers,
+            cache=cache,
+            **kwargs,
+        )
 
     if pys:
-        main_py(pys, fn, **kwargs)
+        from .df import main_py  # Snowpark takes a while to import, and is needed only for Snowpark scripts
+
+        main_py(pys, fn, export=export, **kwargs)
 
 
 @with_connection_args(__doc__)
@@ -44,6 +110,51 @@ def getargs(parser: ArgumentParser) -> Any:
 
     parser.add_argument("-l", "--limit", metavar="NUM", type=natural, help=f"fetch only N rows (default {SOFT_LIMIT})")
     parser.add_argument("-P", "--pretty-headers", action="store_true", help="print, when applicable, human readable headers")
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="for SQL queries, fetch results as Arrow batches and write them column by column (csv, tsv, raw, jsonl)",
+    )
+    parser.add_argument(
+        "--parallel",
+        metavar="N",
+        type=positive,
+        default=1,
+        help="run up to N SQL queries concurrently; results are still output in order (default 1)",
+    )
+    parser.add_argument(
+        "--download-threads",
+        metavar="N",
+        type=positive,
+        default=1,
+        help="download and decode result batches of SQL queries using N threads; output is still in order (default 1)",
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        type=positive,
+        default=1,
+        help="export each result batch of SQL queries to its own part file using N processes, and write a manifest",
+    )
+
+    g = parser.add_argument_group("result cache options")
+    g.add_argument(
+        "--cache-ttl",
+        metavar="SECS",
+        type=natural,
+        help="reuse results of SQL queries cached locally within last SECS seconds "
+        "(default: no caching; not used with --columnar)",
+    )
+    g.add_argument(
+        "--cache-dir", metavar="DIR", type=Path, default=default_dir(), help=f"cache directory (default {default_dir()})"
+    )
+    g.add_argument(
+        "--cache-size",
+        metavar="MB",
+        type=natural,
+        default=1024,
+        help="evict least recently used results beyond this size (default 1024)",
+    )
 
     x = parser.add_mutually_exclusive_group()
     x.set_defaults(cmd=Command.EXPORT)
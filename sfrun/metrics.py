@@ -0,0 +1,71 @@
+"Per-statement metrics of batch runs, and a profile of the slowest statements"
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import TextIO
+
+from yappt import tabulate
+from yappt.grid import AsciiBoxStyle
+
+PROFILE_TOP = 20
+
+
+@dataclass(frozen=True)
+class StatementMetrics:
+    """how long a statement took and what it returned. execute_secs is None for statements sent together with others
+    in one request, as only the time of the whole request is known; query_id can be used to look it up. Statements run
+    as one, such as coalesced inserts, have a single entry for the range of statements from statement to last"""
+
+    script: str
+    statement: int  # from 1
+    query_id: str | None
+    ok: bool
+    execute_secs: float | None = None
+    fetch_secs: float = 0.0  # fetching and formatting the result
+    rows: int | None = None  # returned or affected
+    bytes: int = 0  # of the formatted result
+    last: int | None = None  # of a range of statements run as one
+
+    @property
+    def label(self) -> str:
+        return str(self.statement) if self.last is None else f"{self.statement}-{self.last}"
+
+    @property
+    def secs(self) -> float:
+        return (self.execute_secs or 0.0) + self.fetch_secs
+
+
+class Metrics:
+    "collects statement metrics, from any number of threads, and writes them, if a path is given, as JSON lines"
+
+    def __init__(self, path: Path | None = None):
+        self.file = path.open("w") if path is not None else None
+        self.statements: list[StatementMetrics] = []
+        self.lock = Lock()
+
+    def record(self, m: StatementMetrics) -> None:
+        with self.lock:
+            self.statements.append(m)
+            if self.file is not None:
+                self.file.write(json.dumps(asdict(m)) + "\n")
+                self.file.flush()
+
+    def profile(self, file: TextIO, top: int = PROFILE_TOP) -> None:
+        "print the slowest statements, slowest first"
+        slowest = sorted(self.statements, key=lambda m: m.secs, reverse=True)[:top]
+        tabulate(
+            ([m.script, m.label, m.query_id, m.ok, m.execute_secs, m.fetch_secs, m.secs, m.rows, m.bytes] for m in slowest),
+            headers=["Script", "Stmt", "Query Id", "Ok", "Execute (s)", "Fetch (s)", "Total (s)", "Rows", "Bytes"],
+            types=[str, str, str, bool, float, float, float, int, int],
+            default_fmtspc={int: ",d", float: ",.3f"},
+            default_grid_style=AsciiBoxStyle,
+            file=file,
+        )
+        total = sum(m.secs for m in self.statements)
+        print(f"{len(slowest)} slowest of {len(self.statements)} statements; {total:,.2f}s in all", file=file)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
@@ -1,13 +1,16 @@
 "SQLRunner class to run a batch of SQL statement from a file"
 
 import logging
+import re
 import sys
+from contextlib import AbstractContextManager, contextmanager, nullcontext
 from dataclasses import dataclass
 from functools import partial
 from io import StringIO
-from itertools import islice
+from itertools import groupby, islice, takewhile
 from pathlib import Path
-from typing import Any, Iterable, TextIO, cast
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, TextIO, cast
 
 from sfconn import pytype
 from snowflake.connector import DatabaseError, SnowflakeConnection
@@ -16,24 +19,54 @@ from snowflake.connector.util_text import split_statements
 from yappt import tabulate
 from yappt.grid import AsciiBoxStyle
 
+from . import inserts
+from .journal import Journal, digest
+from .metrics import Metrics, StatementMetrics
 from .util import intersperse
 
 logger = logging.getLogger(__name__)
 
+Numbered = tuple[int, str]  # statement number, from 1, and statement
+Done = tuple[int, str, bool]  # numbered statement, and whether it ran without error
+
+SINGLE_ONLY = re.compile(r"\s*(put|get)\b", re.IGNORECASE)
+# errors with which a multi-statement request is rejected as a whole, before any of its statements run: the number of
+# statements the server split it into is not num_statements
+REJECTED = {8}
+CHILDREN_SQL = """\
+with h as (
+    select query_id, start_time, end_time, execution_status
+    from table(information_schema.query_history_by_session(result_limit => 10000))
+)
+select h.query_id, h.execution_status
+from h, (select start_time, end_time from h where query_id = %s) r
+where h.start_time between r.start_time and r.end_time and h.query_id <> %s
+order by h.start_time"""
+
 
 @dataclass
 class SqlRunner:
     """
-    Run a batch of sqls, optionally conditioally stopping execution and outputing the results to a file
+    Run a batch of sqls, optionally conditioally stopping execution and outputing the results to a file. With
+    batch_size > 1, up to batch_size statements are sent in a single request (Snowflake multi-statement execution).
+    With a journal, completed statements are recorded, and statements already recorded are skipped. With
+    metrics, timings and sizes of each statement are recorded. With coalesce_inserts, consecutive INSERT ... VALUES
+    statements into the same table are run as multi-row inserts
     """
-    sqls: list[str]
+
+    sqls: Iterable[str]
     stop_on_error: bool = True
     pretty: bool = False
     limit: int = 500
     output: Path | None = None
+    batch_size: int = 1
+    journal: Journal | None = None
+    name: str = "<sql>"  # identifies the script in the journal and metrics
+    metrics: Metrics | None = None
+    coalesce_inserts: int = 0  # up to this many inserts into the same table are run as one; 0 to run them as they are
 
-    def run_sql(self, csr: SnowflakeCursor, input: str, output: TextIO) -> bool:
-        "print, run, show results; returns True if no errors"
+    def show_result(self, csr: SnowflakeCursor, output: TextIO) -> None:
+        "print result of the statement the cursor is positioned at"
 
         def prettify_title(t: str) -> str:
             return t.replace("_", " ").title()
@@ -43,13 +76,6 @@ class SqlRunner:
 
         mk_title = prettify_title if self.pretty else raw_title
 
-        try:
-            print(input.rstrip(), file=output)
-            csr.execute(input)
-        except DatabaseError as err:
-            logger.error(err)
-            return False
-
         headers = [mk_title(m.name) for m in csr.description]
         types = [pytype(d) for d in csr.description]
         rows = cast(Iterable[tuple[Any, ...]], csr)
@@ -58,40 +84,261 @@ class SqlRunner:
 
         tabulate(rows, headers=headers, types=types, default_grid_style=AsciiBoxStyle, file=output)
 
+    def show_measured(
+        self, csr: SnowflakeCursor, output: TextIO, n: int, execute_secs: float | None = None, last: int | None = None
+    ) -> None:
+        """show result of the statement the cursor is positioned at, and record metrics of statement number n, or of
+        statements n to last if they were run as one"""
+        if self.metrics is None:
+            return self.show_result(csr, output)
+
+        start, buf = perf_counter(), StringIO()
+        self.show_result(csr, buf)
+        output.write(text := buf.getvalue())
+        fetch_secs = perf_counter() - start
+        self.metrics.record(
+            StatementMetrics(self.name, n, csr.sfqid, True, execute_secs, fetch_secs, csr.rowcount, len(text.encode()), last)
+        )
+
+    def record(self, n: int, ok: bool, query_id: str | None, execute_secs: float | None = None) -> None:
+        "record metrics of statement number n that has no result to show"
+        if self.metrics is not None:
+            self.metrics.record(StatementMetrics(self.name, n, query_id, ok, execute_secs))
+
+    def run_sql(self, csr: SnowflakeCursor, input: str, output: TextIO, n: int = 0) -> bool:
+        "print, run, show results; returns True if no errors. n, the statement number, identifies it in metrics"
+        print(input.rstrip(), file=output)
+        start = perf_counter()
+        try:
+            csr.execute(input)
+        except DatabaseError as err:
+            logger.error(err)
+            self.record(n, False, err.sfqid, perf_counter() - start)
+            return False
+
+        self.show_measured(csr, output, n, perf_counter() - start)
         return True
 
-    def run(self, cnx: SnowflakeConnection) -> bool:
+    def run_each(self, csr: SnowflakeCursor, output: TextIO, stmts: Iterable[Numbered]) -> Iterable[Done]:
+        "run statements one at a time"
+        return intersperse(lambda s: (*s, self.run_sql(csr, s[1], output, s[0])), stmts, file=output)
+
+    def run_insert(self, csr: SnowflakeCursor, output: TextIO, stmts: list[Numbered]) -> Iterable[Done]:
+        """run inserts into the same table as a single insert. If that fails, which inserts no rows, statements are run
+        one at a time, so that errors are reported against the statements that caused them"""
+        first, last = stmts[0][0], stmts[-1][0]
+        print(f"-- statements {first} to {last}, as a single insert", file=output)
+        start = perf_counter()
+        try:
+            csr.execute(inserts.coalesce([sql for _, sql in stmts]))
+        except DatabaseError as err:
+            logger.warning(f"{self.name}: statements {first} to {last} failed as a single insert, running them one by one: {err}")
+            print(file=output)
+            return self.run_each(csr, output, stmts)
+
+        self.show_measured(csr, output, first, perf_counter() - start, last=last)
+        return [(n, sql, True) for n, sql in stmts]
+
+    def run_coalesced(
+        self,
+        csr: SnowflakeCursor,
+        output: TextIO,
+        stmts: Iterable[Numbered],
+        run: Callable[[Iterable[Numbered]], Iterable[Done]],
+    ) -> Iterator[Done]:
+        "run consecutive inserts into the same table, coalesce_inserts at a time, as single inserts; other statements with run"
+        for e, (target, group) in enumerate(groupby(stmts, key=lambda s: inserts.target(s[1]))):
+            if e > 0:
+                print(file=output)
+            if target is None:
+                yield from run(group)
+                continue
+            for i, chunk in enumerate(inserts.chunks(group, self.coalesce_inserts)):
+                if i > 0:
+                    print(file=output)
+                yield from self.run_insert(csr, output, chunk) if len(chunk) > 1 else self.run_each(csr, output, chunk)
+
+    def chunk(self, stmts: list[Numbered]) -> list[Numbered]:
+        "leading statements to send in one request; PUT and GET can't be part of a multi-statement request"
+        if SINGLE_ONLY.match(stmts[0][1]):
+            return stmts[:1]
+        return list(takewhile(lambda s: not SINGLE_ONLY.match(s[1]), stmts[: self.batch_size]))
+
+    def run_batched(self, csr: SnowflakeCursor, output: TextIO, stmts: Iterable[Numbered]) -> Iterator[Done]:
+        """run statements batch_size at a time, each batch in a single request; statements are printed along with their
+        results as before. Yields, in order, each statement that was attempted and whether it ran without error"""
+        it, pending, first = iter(stmts), list[Numbered](), True
+        while pending := pending + list(islice(it, self.batch_size - len(pending))):
+            if not first:
+                print(file=output)
+            first = False
+
+            if len(chunk := self.chunk(pending)) == 1:
+                yield *chunk[0], self.run_sql(csr, chunk[0][1], output, chunk[0][0])
+                del pending[:1]
+                continue
+
+            try:
+                sql = "\n".join(s if s.rstrip().endswith(";") else s + ";" for _, s in chunk)
+                csr.execute(sql, num_statements=len(chunk))
+            except DatabaseError as err:
+                if err.errno in REJECTED:
+                    # the request was rejected as a whole, e.g. when it is split differently by the server
+                    yield from self.run_each(csr, output, chunk)
+                    del pending[: len(chunk)]
+                elif (children := _children(csr, err.sfqid, len(chunk))) is None:
+                    # which statements ran, and which one failed, is not known, e.g. when query history is behind:
+                    # each is shown, and taken not to have completed, so that a journal doesn't skip it on resume
+                    logger.error(f"one of statements {chunk[0][0]} to {chunk[-1][0]} failed, it is not known which: {err}")
+                    for e, (n, sql) in enumerate(chunk):
+                        if e > 0:
+                            print(file=output)
+                        print(sql.rstrip(), file=output)
+                        print(f"-- statement {n} is not known to have completed", file=output)
+                        self.record(n, False, None)
+                        yield n, sql, False
+                    del pending[: len(chunk)]
+                else:
+                    # results of statements that ran before the failed one are fetched by their query ids; statements
+                    # after the failed one are sent again with the next request
+                    for e, ((n, sql), query_id) in enumerate(zip(chunk, children), start=1):
+                        if e > 1:
+                            print(file=output)
+                        print(sql.rstrip(), file=output)
+                        if e < len(children):
+                            csr.get_results_from_sfqid(query_id)
+                            self.show_measured(csr, output, n)
+                        else:
+                            logger.error(f"statement {n} failed: {err}")
+                            self.record(n, False, query_id)
+                        yield n, sql, e < len(children)
+                    del pending[: len(children)]
+                continue
+
+            for e, (n, sql) in enumerate(chunk):
+                if e > 0:
+                    print(file=output)
+                    csr.nextset()
+                print(sql.rstrip(), file=output)
+                self.show_measured(csr, output, n)
+                yield n, sql, True
+            del pending[: len(chunk)]
+
+    def pending(self, stmts: Iterable[str]) -> Iterator[Numbered]:
+        "statements, numbered from 1, that have not completed in an earlier run according to the journal"
+        it = enumerate(stmts, start=1)
+        if (journal := self.journal) is None:
+            return it
+
+        def unfinished() -> Iterator[Numbered]:
+            skipped = 0
+            for n, sql in it:
+                if journal.completed(self.name, n, sql):
+                    skipped += 1
+                    continue
+                if skipped:
+                    logger.info(f"{self.name}: skipping {skipped} statement(s) before {n} that completed earlier")
+                    skipped = 0
+                yield n, sql
+            if skipped:
+                logger.info(f"{self.name}: skipping the last {skipped} statement(s), they completed earlier")
+
+        return unfinished()
+
+    @contextmanager
+    def statements(self) -> Iterator[Iterable[str]]:
+        "statements to run; those of a script are read as they are run"
+        with self.sqls.open() if isinstance(self.sqls, Script) else nullcontext(self.sqls) as sqls:
+            yield sqls
+
+    def run(self, cnx: SnowflakeConnection, stdout: TextIO | None = None) -> bool:
         """reads, parses and attempts to run all statments from file.
 
         Args:
             cnx: Snowflake connection
+            stdout: where to print results if no output file was specified (default sys.stdout)
 
         Returns:
             True if all statements ran without error, False otherwise
         """
+
+        def journaled(done: Iterable[Done]) -> Iterator[bool]:
+            for n, sql, ok in done:
+                if ok and self.journal is not None:
+                    self.journal.record(self.name, n, sql)
+                yield ok
+
         def run_all(outf: TextIO) -> bool:
-            with cnx.cursor() as csr:
-                done = intersperse(partial(self.run_sql, csr, output=outf), self.sqls)
+            with self.statements() as sqls, cnx.cursor() as csr:
+                stmts = self.pending(sqls)
+                run = partial(self.run_batched if self.batch_size > 1 else self.run_each, csr, outf)
+                done = journaled(self.run_coalesced(csr, outf, stmts, run) if self.coalesce_inserts else run(stmts))
                 if self.stop_on_error:
                     return all(done)
 
                 return sum(1 for d in done if not d) == 0
 
         if self.output is None:
-            return run_all(sys.stdout)
+            return run_all(stdout or sys.stdout)
 
         with self.output.open("w") as outf:
             return run_all(outf)
 
 
-class SqlScript(SqlRunner):
-    """reads, parses and attempts to run all statments from file"""
+def _children(csr: SnowflakeCursor, sfqid: str | None, size: int) -> list[str] | None:
+    """query ids of statements of a failed multi-statement request of size statements that were started, the last of
+    which failed, or None if that can't be determined. Statements of a request run, one at a time, while the request
+    runs; query history may lag, so unless the last one found is the one that failed, the list may be incomplete"""
+    if sfqid is None:
+        return None
+    try:
+        csr.execute(CHILDREN_SQL, (sfqid, sfqid))
+        children = cast(list[tuple[str, str]], csr.fetchall())
+    except DatabaseError:
+        return None
+    if not 0 < len(children) <= size or children[-1][1] != "FAILED_WITH_ERROR":
+        return None
+    return [query_id for query_id, _ in children]
+
+
+@dataclass
+class Script:
+    """statements of a file, stdin (None) or a string, parsed as they are read, so that large scripts are not held in
+    memory, and statements piped to stdin run as they arrive"""
 
-    def __init__(self, input: Path | str | None, out_dir: Path | None = None, output_ext: str = "log", output: Path | None = None, **kwargs: Any):
-        text = cast(str, sys.stdin.read()) if input is None else input if isinstance(input, str) else input.read_text()
-        sqls = [stmt for stmt, _ in split_statements(StringIO(text.strip()), remove_comments=True)]
+    input: Path | str | None
+
+    @contextmanager
+    def open(self) -> Iterator[Iterator[str]]:
+        src: AbstractContextManager[TextIO]
+        if isinstance(self.input, Path):
+            src = self.input.open()
+        else:
+            src = nullcontext(sys.stdin if self.input is None else StringIO(self.input))
+        with src as f:
+            yield (stmt for stmt, _ in split_statements(f, remove_comments=True))
+
+    def __iter__(self) -> Iterator[str]:
+        with self.open() as stmts:
+            yield from stmts
+
+
+class SqlScript(SqlRunner):
+    "reads, parses and attempts to run all statments from a file, stdin (None) or a string"
 
+    def __init__(
+        self,
+        input: Path | str | None,
+        out_dir: Path | None = None,
+        output_ext: str = "log",
+        output: Path | None = None,
+        **kwargs: Any,
+    ):
         if out_dir is not None and output is None and isinstance(input, Path):
             output = out_dir / f"{input.stem}.{output_ext}"
 
-        return SqlRunner.__init__(self, sqls, output = output, **kwargs)
+        if isinstance(input, Path):
+            name = str(input.resolve())
+        else:  # queries are told apart by their text, so that each has its own entries in the journal
+            name = "<stdin>" if input is None else f"<query {digest(input)[:12]}>"
+        return SqlRunner.__init__(self, Script(input), output=output, name=name, **kwargs)
@@ -0,0 +1,461 @@
+"""sfrun daemon: runs sfrun and sfrunb commands sent by clients (see client.py) on connections it keeps open
+
+Worker processes, forked up front, take turns accepting clients on a Unix socket. A client sends its arguments, working
+directory, environment and its stdin, stdout and stderr (as file descriptors); the worker runs the command with them, on
+a connection (or Snowpark session) that it keeps open, for the same connection arguments and environment, from earlier
+commands, and replies with the exit code. If the client goes away first, queries of the command are cancelled, and the
+command is stopped.
+
+After a command, its open transaction is rolled back, and the role, warehouse, database and schema it changed are
+restored. A connection whose other session state changed, such as parameters set by ALTER SESSION, secondary roles or
+variables, is closed instead of being reused"""
+
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Self, TextIO, cast
+
+from sfconn import getconn
+from snowflake.connector import DatabaseError, Error, SnowflakeConnection
+from snowflake.connector.cursor import SnowflakeCursor
+
+from . import conn
+from .client import SOCKET_ENV, default_socket
+from .util import __version__, positive
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 4
+MAX_IDLE = 3600  # seconds; connections idle for longer are closed, instead of being reused
+MAX_REQUEST = 1024 * 1024
+POLL_MS = 200  # how often a worker checks that the client of a command is still there
+# connections are opened, and looked up, with environment variables such as these, e.g. SNOWFLAKE_HOME
+CONNECTION_ENV = ("SNOWFLAKE_", "SNOWSQL_", "SFCONN_")
+
+
+class Terminated(BaseException):
+    "raised in a worker that is terminated; unlike SystemExit, it isn't taken to be the exit of a command"
+
+
+class Disconnected(BaseException):
+    "raised in a worker, by SIGUSR1, when the client of the running command goes away"
+
+
+Context = tuple[str | None, str | None, str | None, str | None]  # role, warehouse, database, schema
+State = tuple[Any, ...]  # session parameters, secondary roles and variables
+
+
+def _cnx(obj: Any) -> SnowflakeConnection:
+    "connection of a connection or a Snowpark session"
+    return obj if isinstance(obj, SnowflakeConnection) else obj.connection
+
+
+def _context(cnx: SnowflakeConnection) -> Context:
+    return cnx.role, cnx.warehouse, cnx.database, cnx.schema
+
+
+def _state(csr: SnowflakeCursor) -> State:
+    "session state, other than the context, that commands may change"
+    parameters = tuple((r[0], r[1]) for r in csr.execute("show parameters in session"))  # type: ignore
+    roles = cast(tuple[str], csr.execute("select current_secondary_roles()").fetchone())[0]  # type: ignore
+    variables = tuple(map(tuple, csr.execute("show variables")))  # type: ignore
+    return parameters, roles, variables
+
+
+def _connection_env() -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, v) for k, v in os.environ.items() if k == "HOME" or k.startswith(CONNECTION_ENV)))
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+@contextmanager
+def _held() -> Iterator[None]:
+    "SIGUSR1, which stops a command whose client went away, is held until the block completes"
+    mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGUSR1})
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+
+class Lender:
+    """open connections and sessions of a worker, by connection arguments and environment, and the context and state
+    each started with"""
+
+    def __init__(self, max_idle: float = MAX_IDLE):
+        self.max_idle = max_idle
+        self.idle: dict[tuple[Any, ...], tuple[Any, Context, State, float]] = {}
+        self.lent: list[Any] = []
+
+    @contextmanager
+    def lend(self, args: dict[str, Any], session: bool) -> Iterator[Any]:
+        key = (session, _connection_env(), *sorted(args.items()))
+        if (item := self.idle.pop(key, None)) is not None:
+            obj, context, state, since = item
+            if time.monotonic() - since > self.max_idle or _cnx(obj).is_closed():
+                self._close(obj)
+                item = None
+        if item is None:
+            if session:
+                from sfconn import getsess
+
+                obj = getsess(**args)
+            else:
+                obj = getconn(**args)
+            context = _context(_cnx(obj))
+            with _cnx(obj).cursor() as csr:
+                state = _state(csr)
+
+        self.lent.append(obj)
+        try:
+            yield obj
+        finally:
+            with _held():
+                if self._restore(_cnx(obj), context, state):
+                    self.idle[key] = (obj, context, state, time.monotonic())
+                else:
+                    self._close(obj)
+                self.lent.remove(obj)
+
+    def _restore(self, cnx: SnowflakeConnection, context: Context, state: State) -> bool:
+        """roll back the open transaction, if any, and restore role, warehouse, database and schema; False if the
+        connection can't be reused, such as when other session state changed"""
+        if cnx.is_closed():
+            return False
+        try:
+            cnx.rollback()
+            with cnx.cursor() as csr:
+                for kind, was, now in zip(("role", "warehouse", "database", "schema"), context, _context(cnx)):
+                    if was != now:
+                        if was is None:
+                            return False
+                        csr.execute(f"use {kind} {_quote(was)}")
+                if _state(csr) != state:
+                    logger.info("closing a connection whose session parameters, secondary roles or variables changed")
+                    return False
+        except DatabaseError as err:
+            logger.warning(f"closing a connection whose context could not be restored: {err}")
+            return False
+        return True
+
+    def _close(self, obj: Any) -> None:
+        try:
+            obj.close()
+        except (Error, OSError) as err:
+            logger.debug(f"error closing a connection: {err}")
+
+    def cancel(self) -> None:
+        "cancel queries running on lent connections"
+        for obj in list(self.lent):
+            cnx = _cnx(obj)
+            try:
+                with cnx.cursor() as csr:
+                    csr.execute("select system$cancel_all_queries(%s)", (cnx.session_id,))
+            except DatabaseError as err:
+                logger.warning(f"could not cancel queries of a client that went away: {err}")
+
+    def reclaim(self) -> None:
+        "close connections of a command that was stopped before it returned them"
+        for obj in self.lent:
+            self._close(obj)
+        self.lent.clear()
+
+    def close(self) -> None:
+        for obj, *_ in self.idle.values():
+            self._close(obj)
+        self.idle.clear()
+
+
+def call(prog: str, args: list[str]) -> int:
+    "run a command as its console script would, and return its exit code"
+    from . import batch, main
+
+    sys.argv = [prog, *args]
+    try:
+        rc = batch.cli() if prog == "sfrunb" else main.cli()
+        return rc if isinstance(rc, int) else 0
+    except SystemExit as err:
+        if err.code is None or isinstance(err.code, int):
+            return err.code or 0
+        print(err.code, file=sys.stderr)
+        return 1
+    except Exception:  # as the console script would, with a traceback, which goes to the client's stderr
+        logger.exception(f"{prog} failed")
+        return 1
+
+
+@dataclass
+class Home:
+    "state of a worker that commands change, which is restored after each: standard streams, directory, environment"
+
+    fds: list[int]  # duplicates of 0, 1 and 2
+    cwd: str
+    env: dict[str, str]
+    argv: list[str]
+    stdin: TextIO
+    stdout: TextIO
+
+    @classmethod
+    def save(cls) -> Self:
+        return cls([os.dup(fd) for fd in (0, 1, 2)], os.getcwd(), dict(os.environ), sys.argv, sys.stdin, sys.stdout)
+
+    def restore(self) -> None:
+        "restore the saved state, which may be done again if a command was stopped while it was restored"
+        with _held():
+            try:
+                sys.stderr.flush()
+            except BrokenPipeError:
+                pass
+            sys.stdin, sys.stdout, sys.argv = self.stdin, self.stdout, self.argv
+            os.environ.clear()
+            os.environ.update(self.env)
+            for fd, saved in zip((0, 1, 2), self.fds):
+                os.dup2(saved, fd)
+            os.chdir(self.cwd)
+
+    def close(self) -> None:
+        for fd in self.fds:
+            os.close(fd)
+
+
+def run(prog: str, args: list[str], cwd: str, env: dict[str, str], fds: list[int], home: Home) -> int:
+    "run a command in cwd with the environment, stdin, stdout and stderr of the client, and restore home after"
+    sys.stdout.flush()
+    sys.stderr.flush()
+    rc = 1
+    try:
+        for fd, client_fd in zip((0, 1, 2), fds):
+            os.dup2(client_fd, fd)
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(env)
+        # new objects, so that nothing read from, or buffered for, an earlier client is seen by this one
+        with open(0, closefd=False) as sys.stdin, open(1, "w", buffering=1 if os.isatty(1) else -1, closefd=False) as sys.stdout:
+            rc = call(prog, args)
+    except BrokenPipeError:  # output left when the client's stdout, a pipe, was closed
+        pass
+    finally:
+        home.restore()
+    return rc
+
+
+@contextmanager
+def watching(client: socket.socket, hangup: Callable[[], None]) -> Iterator[None]:
+    "call hangup, from another thread, if the client hangs up before the block completes"
+    done = threading.Event()
+
+    def watch() -> None:
+        poll = select.poll()
+        poll.register(client, select.POLLIN | select.POLLHUP)
+        while not done.is_set():
+            if not poll.poll(POLL_MS):
+                continue
+            try:
+                if client.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT):
+                    return  # clients send nothing more while their command runs
+            except BlockingIOError:
+                continue
+            except OSError:
+                pass
+            if not done.is_set():
+                hangup()
+            return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        done.set()
+        watcher.join()
+
+
+def _disconnected(*_: Any) -> None:
+    raise Disconnected()
+
+
+def handle(client: socket.socket, lender: Lender | None = None) -> None:
+    """run the command sent by a client and reply with its exit code. If the client goes away first, queries running on
+    connections of the lender are cancelled, and the command is stopped. Connections and the worker's state are
+    restored, before the command is stopped, if it goes away as they are"""
+
+    def hangup() -> None:
+        logger.warning("the client went away, stopping its command")
+        if lender is not None:
+            lender.cancel()
+        signal.pthread_kill(threading.main_thread().ident, signal.SIGUSR1)  # type: ignore
+
+    msg, fds, _, _ = socket.recv_fds(client, MAX_REQUEST, 3)
+    if not msg and not fds:  # e.g. checking if the daemon is running
+        return
+    home = Home.save()
+    try:
+        while msg and not msg.endswith(b"\n") and len(msg) < MAX_REQUEST:
+            if not (more := client.recv(MAX_REQUEST)):
+                break
+            msg += more
+        if len(fds) != 3:
+            raise ValueError(f"expected stdin, stdout and stderr, received {len(fds)} file descriptors")
+        request = json.loads(msg)
+        logger.info(f"running {request['prog']} {' '.join(request['args'])} in {request['cwd']}")
+        with watching(client, hangup):
+            rc = run(request["prog"], request["args"], request["cwd"], request["env"], fds, home)
+    except (ValueError, KeyError) as err:
+        logger.error(f"invalid request: {err}")
+        rc = 2
+    except Disconnected:  # which may have been raised before restoring started
+        home.restore()
+        if lender is not None:
+            lender.reclaim()
+        return
+    finally:
+        home.close()
+        for fd in fds:
+            os.close(fd)
+    client.sendall(json.dumps({"rc": rc}).encode() + b"\n")
+
+
+def _terminate(*_: Any) -> None:
+    raise Terminated()
+
+
+def worker(server: socket.socket, max_idle: float) -> None:
+    "accept and serve clients, one at a time, until terminated (by SIGTERM, which raises Terminated)"
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _terminate)
+    signal.signal(signal.SIGUSR1, _disconnected)
+    lender = Lender(max_idle)
+    conn.lender = lender.lend
+    try:
+        while True:
+            client, _ = server.accept()
+            with client:
+                try:
+                    handle(client, lender)
+                except OSError as err:
+                    logger.warning(f"lost a client: {err}")
+                except Exception:
+                    logger.exception("failed to serve a client")
+    finally:
+        lender.close()
+
+
+def _listening(path: Path) -> bool:
+    "True if a daemon accepts connections at path"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(path))
+            return True
+        except OSError:
+            return False
+
+
+def serve(path: Path, workers: int = WORKERS, max_idle: float = MAX_IDLE) -> None:
+    "listen on a Unix socket at path, with workers worker processes, until interrupted or terminated"
+    if path.exists():
+        if _listening(path):
+            raise SystemExit(f"a daemon is already listening on {path}")
+        path.unlink()
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    for module in ("main", "batch", "df"):  # loaded once, and shared by all workers
+        import_module(f".{module}", __package__)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)  # only this user may connect, as commands run with this user's credentials
+    try:
+        server.bind(str(path))
+    finally:
+        os.umask(umask)
+    server.listen(128)
+
+    def start() -> int:
+        if (pid := os.fork()) == 0:
+            rc = 0
+            try:
+                worker(server, max_idle)
+            except Terminated:
+                pass
+            except BaseException:
+                logger.exception("worker failed")
+                rc = 1
+            finally:
+                os._exit(rc)
+        return pid
+
+    stopping = False
+
+    def stop(*_: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    pids = {start() for _ in range(workers)}
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logger.info(f"listening on {path} with {workers} workers; set {SOCKET_ENV}={path} to run commands here")
+
+    try:
+        while pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            pids.discard(pid)
+            if not stopping:
+                logger.warning(f"worker {pid} exited ({status}), starting another")
+                pids.add(start())
+    finally:
+        server.close()
+        path.unlink(missing_ok=True)
+
+
+def getargs(args: list[str] | None = None) -> Any:
+    parser = ArgumentParser(prog="sfrun serve", description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--socket", metavar="PATH", type=Path, default=default_socket(), help=f"Unix socket (default {default_socket()})"
+    )
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        type=positive,
+        default=WORKERS,
+        help=f"serve up to N commands at the same time, each worker with its own connections (default {WORKERS})",
+    )
+    parser.add_argument(
+        "--max-idle",
+        metavar="SECS",
+        type=positive,
+        default=MAX_IDLE,
+        help=f"reconnect, instead of reusing connections, idle for longer than this (default {MAX_IDLE})",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_const", const=logging.INFO, default=logging.WARNING, help="log commands that are run"
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    return parser.parse_args(args)
+
+
+def cli(args: list[str] | None = None) -> None:
+    "`sfrun serve` entry-point"
+    opts = getargs(args)
+    conn.init_logging(logger, opts.verbose)
+    serve(opts.socket, opts.workers, opts.max_idle)
@@ -0,0 +1,55 @@
+"Export result batches to part files in parallel, one process per batch"
+
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any
+
+from snowflake.connector.result_batch import ResultBatch
+
+from .formats import Exporter
+from .formats.parts import write_manifest
+
+
+def _rows(batch: ResultBatch | None) -> Iterator[tuple[Any, ...]]:
+    for r in [] if batch is None else batch.create_iter():
+        if isinstance(r, Exception):
+            raise r
+        yield r  # type: ignore
+
+
+def _export_batch(
+    exporter: Exporter, headers: list[str], types: list[type], columnar: bool, job: tuple[int, ResultBatch | None]
+) -> dict[str, Any]:
+    "write one result batch as a complete part file; runs in a worker process"
+    n, batch = job
+    part = exporter.part(n)
+    output = part.path if exporter.format.needs_file else part
+
+    if columnar and batch is not None and (export_arrow := exporter.format._export_arrow) is not None:
+        table = batch.to_arrow()
+        part.rows = table.num_rows
+        export_arrow([table], headers, types, output)
+    else:
+        exporter.writer(part.feed(_rows(batch)), headers, types, output)
+
+    return part.entry()
+
+
+def export_batches(
+    batches: Iterable[ResultBatch],
+    exporter: Exporter,
+    headers: list[str],
+    types: list[type],
+    workers: int,
+    columnar: bool = False,
+) -> None:
+    "write each result batch to its own part file using a pool of worker processes, followed by a manifest"
+    if exporter.file is None:
+        raise ValueError("an output file is required to export result batches in parallel")
+
+    jobs: list[tuple[int, ResultBatch | None]] = list(enumerate(batches, start=1)) or [(1, None)]
+    with ProcessPoolExecutor(workers) as pool:
+        parts = list(pool.map(partial(_export_batch, exporter, headers, types, columnar), jobs))
+
+    write_manifest(exporter.file, parts)
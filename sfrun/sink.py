@@ -0,0 +1,144 @@
+"Buffered text output: writes are collected into large chunks that are encoded and written to a binary stream at once"
+
+import codecs
+import io
+import sys
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, BinaryIO, TextIO, cast
+
+BUFFER_SIZE = 256 * 1024  # characters
+
+
+class Sink(io.TextIOBase):
+    """text stream over a binary target. Text is collected until about buffer_size characters are pending, and then
+    encoded and written with a single call, which avoids the per-write overhead of a TextIOWrapper. bytes_written counts
+    (encoded) bytes as they are written to the sink, including those still pending. With line_buffering, as for a
+    terminal, pending text is written at the end of each line. A text target, such as a StringIO, is written to without
+    encoding"""
+
+    def __init__(
+        self,
+        target: BinaryIO | TextIO,
+        buffer_size: int = BUFFER_SIZE,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        close_target: bool = True,
+        text: bool = False,
+        line_buffering: bool = False,
+    ):
+        super().__init__()
+        self.target = target
+        self.text = text
+        self.buffer_size = buffer_size
+        self._encoding = encoding
+        self._errors = errors
+        self.close_target = close_target
+        self.line_buffering = line_buffering
+        self.chunks: list[str] = []
+        self.encoded: list[bytes] = []  # written before chunks, encoded as non-ASCII text was written
+        self.pending = 0
+        self.bytes_written = 0
+
+    @property
+    def encoding(self) -> str:  # type: ignore
+        return self._encoding
+
+    @property
+    def errors(self) -> str:  # type: ignore
+        return self._errors
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        if s.isascii():
+            self.chunks.append(s)
+            self.bytes_written += len(s)
+        elif self.text:
+            self.chunks.append(s)
+            self.bytes_written += len(s.encode(self._encoding, self._errors))
+        else:  # encoded once, to count its bytes, and kept, after the text that came before it
+            if self.chunks:
+                self.encoded.append("".join(self.chunks).encode(self._encoding, self._errors))
+                self.chunks.clear()
+            self.encoded.append(b := s.encode(self._encoding, self._errors))
+            self.bytes_written += len(b)
+        self.pending += len(s)
+        if self.pending >= self.buffer_size or (self.line_buffering and "\n" in s):
+            self.flush()
+        return len(s)
+
+    def writelines(self, lines: Iterable[str]) -> None:  # type: ignore
+        for s in lines:
+            self.write(s)
+
+    def flush(self) -> None:
+        if self.text and self.chunks:
+            self.target.write("".join(self.chunks))  # type: ignore
+        elif self.chunks or self.encoded:
+            self.encoded.append("".join(self.chunks).encode(self._encoding, self._errors))
+            self.target.write(b"".join(self.encoded))  # type: ignore
+            self.encoded.clear()
+        self.chunks.clear()
+        self.pending = 0
+        self.target.flush()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        try:
+            super().close()  # flushes
+        finally:
+            if self.close_target:
+                self.target.close()
+
+
+class Decoder(io.RawIOBase):
+    """binary stream that decodes what is written to it and writes the text to a text stream. Bytes that don't decode
+    are kept as surrogates (surrogateescape), so binary output can still be recovered from the text"""
+
+    def __init__(self, target: TextIO, encoding: str = "utf-8"):
+        super().__init__()
+        self.target = target
+        self.decoder = codecs.getincrementaldecoder(encoding)("surrogateescape")
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        self.target.write(self.decoder.decode(bytes(b)))
+        return len(b)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+
+def stdout_binary() -> BinaryIO:
+    """binary stream underlying stdout; if stdout was replaced by a text stream that has none, such as a StringIO by
+    contextlib.redirect_stdout, a Decoder that writes to it"""
+    sys.stdout.flush()
+    if (buffer := getattr(sys.stdout, "buffer", None)) is not None:
+        return buffer
+    return cast(BinaryIO, Decoder(sys.stdout, getattr(sys.stdout, "encoding", None) or "utf-8"))
+
+
+def stdout_sink(buffer_size: int = BUFFER_SIZE) -> Sink:
+    """sink that writes pre-encoded text directly to the binary buffer underlying stdout, or text to stdout if it was
+    replaced by a text stream that has none, such as a StringIO by contextlib.redirect_stdout. Output to a terminal is
+    written line by line"""
+    sys.stdout.flush()
+    encoding, errors = getattr(sys.stdout, "encoding", None) or "utf-8", getattr(sys.stdout, "errors", None) or "strict"
+    tty = sys.stdout.isatty()
+    if (buffer := getattr(sys.stdout, "buffer", None)) is None:
+        return Sink(sys.stdout, buffer_size, encoding, errors, close_target=False, text=True, line_buffering=tty)
+    return Sink(buffer, buffer_size, encoding, errors, close_target=False, line_buffering=tty)
+
+
+def open_sink(output: Any, buffer_size: int = BUFFER_SIZE) -> Sink:
+    "sink that writes to stdout if output is None, to a file path, or to an output (such as OutputFile) that has a sink()"
+    if output is None:
+        return stdout_sink(buffer_size)
+    if isinstance(output, Path):
+        return Sink(output.open("wb"), buffer_size)
+    return output.sink(buffer_size)
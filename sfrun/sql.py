@@ -1,42 +1,73 @@
 "Snwoflake SQL query runner; print output in different formats"
 
+from collections import deque
+from collections.abc import Callable, Iterable
+from contextlib import nullcontext
+from dataclasses import replace
+from functools import partial
+from itertools import islice
 from logging import getLogger
 from pathlib import Path
 from string import whitespace
 from typing import Any, cast
 
-from sfconn import pytype, with_connection
-from snowflake.connector import SnowflakeConnection
+from sfconn import pytype
+from snowflake.connector import DatabaseError, SnowflakeConnection
 from snowflake.connector.constants import FIELD_TYPES
-from snowflake.connector.cursor import SnowflakeCursor
+from snowflake.connector.cursor import ResultMetadata, SnowflakeCursor
+from snowflake.connector.result_batch import ResultBatch
 
 from . import __name__ as this_module
-from .formats import Format
-from .util import Command, Data, ExportFn, prettify, take
+from .cache import ResultCache
+from .conn import with_connection
+from .formats import Exporter, Format
+from .shard import export_batches
+from .util import SOFT_LIMIT, ArrowData, Command, Data, ExportFn, ordered_map, prettify, take, take_batches
 
 
-def main_sql(sqls: list[str], cmd: Command, **kwargs: Any) -> None:
-    "run command against each SQL from the list"
-    sqls_ = (s.rstrip(whitespace + ";") for s in sqls)
+def main_sql(
+    sqls: list[str],
+    cmd: Command,
+    parallel: int = 1,
+    names: list[str] | None = None,
+    pushdown: list[bool] | None = None,
+    export: ExportFn | None = None,
+    **kwargs: Any,
+) -> None:
+    """run command against each SQL from the list; names, which default to 'Query N', identify results when they
+    are exported together, such as sheets of an Excel workbook. The limit is pushed into SQLs flagged in pushdown,
+    which must be simple selects such as `select * from table`, when they are run"""
+    sqls_ = [s.rstrip(whitespace + ";") for s in sqls]
+    names_ = names or [f"Query {e}" for e in range(1, len(sqls_) + 1)]
+    pushdown_ = pushdown or [False] * len(sqls_)
+    exporter = Format.default().export() if export is None else export
 
     @with_connection(getLogger(this_module))
     def go(cnx: SnowflakeConnection, **kwargs: Any):
-        with cnx.cursor() as csr:
-            for sql in sqls_:
-                match cmd:
-                    case Command.EXPORT:
-                        _run(csr, sql=sql, **kwargs)
-                    case Command.SHOW_SCHEMA:
-                        _print_meta(csr, sql=sql)
-                    case Command.SHOW_SQL:
-                        pass
+        sheets = exporter.sheets() if isinstance(exporter, Exporter) else nullcontext(lambda _: exporter)
+        with sheets as export_for:
+            jobs = ((sql, p, export_for(name)) for sql, name, p in zip(sqls_, names_, pushdown_))
+            if cmd == Command.EXPORT and parallel > 1:
+                return _run_parallel(cnx, jobs, parallel=parallel, **kwargs)
 
+            with cnx.cursor() as csr:
+                for sql, p, export_ in jobs:
+                    match cmd:
+                        case Command.EXPORT:
+                            _run(csr, sql=sql, pushdown=p, export=export_, **kwargs)
+                        case Command.SHOW_SCHEMA:
+                            _print_meta(csr, sql=sql)
+                        case Command.SHOW_SQL:
+                            pass
 
     if cmd == Command.SHOW_SQL:
         for sql in sqls_:
             print(sql + ";")
     else:
-        go(**kwargs)  # type: ignore
+        try:
+            go(**kwargs)  # type: ignore
+        except ImportError as err:
+            raise SystemExit(str(err))
 
 
 def _print_meta(csr: SnowflakeCursor, sql: str, export: ExportFn = Format.default().export(), **_: Any):
@@ -49,20 +80,168 @@ def _print_meta(csr: SnowflakeCursor, sql: str, export: ExportFn = Format.defaul
     export(data, headers, types)
 
 
+def _limited(sql: str, limit: int | None) -> str:
+    """sql with the limit pushed into it, so that the warehouse doesn't scan more than needed; one extra row over the
+    soft limit lets take() detect truncation"""
+    limit = SOFT_LIMIT + 1 if limit is None else limit
+    return sql + (f" limit {limit}" if limit > 0 else "")
+
+
 def _run(
     csr: SnowflakeCursor,
     sql: str,
     export: ExportFn = Format.default().export(),
     limit: int | None = None,
     pretty_headers: bool = False,
+    cache: ResultCache | None = None,
+    pushdown: bool = False,
+    **kwargs: Any,
+) -> None:
+    "run sql, with the limit pushed into it if pushdown is set, and export its result; kwargs are passed to _export()"
+    if cache is not None and (cached := cache.get(csr.connection, sql, limit)) is not None:
+        names, types, data = cached
+        export(data, prettify(names) if pretty_headers else names, types)
+        return
+
+    csr.execute(_limited(sql, limit) if pushdown else sql)
+    save = None if cache is None else partial(cache.put, csr.connection, sql, limit)
+    _export(csr, export=export, limit=limit, pretty_headers=pretty_headers, save=save, **kwargs)
+
+
+def _run_parallel(
+    cnx: SnowflakeConnection,
+    jobs: Iterable[tuple[str, bool, ExportFn]],
+    parallel: int,
+    cache: ResultCache | None = None,
+    **kwargs: Any,
 ) -> None:
-    csr.execute(sql)
-    if limit is not None and limit > 0 and csr.rowcount is not None and csr.rowcount > limit:
-        csr.execute(f"select * from (table(result_scan())) limit {limit}")
+    """run each sql, with the limit pushed into it if flagged, and export its result with the paired export function;
+    keep up to `parallel` queries running on the server ahead of the one being exported, and export in the original
+    order. If a query, or an export, fails, queries that were submitted after it are cancelled"""
+
+    def submit(sql: str, pushdown: bool, export: ExportFn) -> tuple[str, bool, ExportFn, str | None]:
+        if cache is not None and cache.contains(cnx, sql, kwargs.get("limit")):
+            return sql, pushdown, export, None
+        return sql, pushdown, export, csr.execute_async(_limited(sql, kwargs.get("limit")) if pushdown else sql)["queryId"]
+
+    jobs = iter(jobs)
+    with cnx.cursor() as csr:
+        pending = deque[tuple[str, bool, ExportFn, str | None]]()
+        try:
+            pending.extend(submit(*job) for job in islice(jobs, parallel))
+            while pending:
+                sql, pushdown, export, sfqid = pending.popleft()
+                for job in islice(jobs, 1):
+                    pending.append(submit(*job))
+                if sfqid is None:
+                    _run(csr, sql, export=export, cache=cache, pushdown=pushdown, **kwargs)
+                else:
+                    csr.get_results_from_sfqid(sfqid)
+                    save = None if cache is None else partial(cache.put, cnx, sql, kwargs.get("limit"))
+                    _export(csr, export=export, save=save, **kwargs)
+        except BaseException:
+            for *_, sfqid in pending:
+                if sfqid is not None:
+                    _cancel(cnx, sfqid)
+            raise
+
+
+def _cancel(cnx: SnowflakeConnection, sfqid: str) -> None:
+    "cancel a query whose result is no longer needed"
+    try:
+        with cnx.cursor() as csr:
+            csr.execute("select system$cancel_query(%s)", (sfqid,))
+    except DatabaseError as err:
+        getLogger(this_module).warning(f"could not cancel query {sfqid}: {err}")
+
+
+def _column(m: ResultMetadata) -> tuple[str, int | None, int | None]:
+    "Snowflake type, precision and scale of a column"
+    return FIELD_TYPES[m.type_code].name, m.precision, m.scale
 
-    headers = prettify(m.name for m in csr.description) if pretty_headers else [m.name for m in csr.description]
+
+def _display_width(m: ResultMetadata) -> int | None:
+    "width of formatted values of a column, if it is known from the column metadata"
+    match FIELD_TYPES[m.type_code].name:
+        case "FIXED" if m.precision is not None:
+            digits = max(m.precision - (m.scale or 0), 1)
+            return 1 + digits + (digits - 1) // 3 + (3 if m.scale else 0)  # sign, thousands separators, 2 decimals
+        case "TEXT":
+            return m.internal_size
+        case "BOOLEAN":
+            return 1
+        case "DATE":
+            return 10
+        case "TIME":
+            return 8
+        case "TIMESTAMP_LTZ" | "TIMESTAMP_NTZ" | "TIMESTAMP_TZ":
+            return 19
+        case _:
+            return None
+
+
+def _export(
+    csr: SnowflakeCursor,
+    export: ExportFn,
+    limit: int | None = None,
+    pretty_headers: bool = False,
+    columnar: bool = False,
+    save: Callable[[list[str], list[type], Data, Callable[[], int | None]], Data] | None = None,
+    download_threads: int = 1,
+    workers: int = 1,
+) -> None:
+    """export result of the query last executed on the cursor; rows are passed through save(), if supplied, as they are
+    exported, along with a function that returns the number of rows they were truncated after, if they were. With
+    download_threads > 1, result batches are downloaded and decoded concurrently, but exported in order.
+    With workers > 1, each result batch is exported to its own part file by a pool of processes"""
+    names = [m.name for m in csr.description]
+    headers = prettify(names) if pretty_headers else names
     types = [pytype(d) for d in csr.description]
-    data = take(cast(Data, csr)) if limit is None else cast(Data, csr)
+
+    if isinstance(export, Exporter) and export.width_sample is not None:
+        export = replace(export, widths=tuple(_display_width(d) for d in csr.description))
+    if isinstance(export, Exporter) and export.format in (Format.PARQUET, Format.ARROW):
+        export = replace(export, columns=tuple(_column(d) for d in csr.description))
+    if isinstance(export, Exporter) and export.format is Format.ARROW:
+        columnar = True  # results are fetched as Arrow batches, which are written as-is
+
+    if workers > 1 and isinstance(export, Exporter):
+        export_batches(csr.get_result_batches() or [], export, headers, types, workers=workers, columnar=columnar)
+        return
+
+    result_batches = csr.get_result_batches() if download_threads > 1 else None
+    cnx = csr.connection
+
+    def batch_rows(b: ResultBatch) -> list[tuple[Any, ...]]:
+        rows = list(b.create_iter(connection=cnx))
+        if (err := next((r for r in rows if isinstance(r, Exception)), None)) is not None:
+            raise err
+        return cast(list[tuple[Any, ...]], rows)
+
+    if columnar and isinstance(export, Exporter) and (export_arrow := export.arrow) is not None:
+        if result_batches is None:
+            batches = cast(ArrowData, csr.fetch_arrow_batches())
+        else:
+            batches = ordered_map(lambda b: b.to_arrow(connection=cnx), result_batches, download_threads)
+        if limit is None:
+            batches = take_batches(batches)
+        elif limit > 0:
+            batches = take_batches(batches, limit, warn=False)
+        export_arrow(batches, headers, types)
+        return
+
+    # rows are fetched lazily, so stopping after the limit avoids downloading the rest of the result
+    if result_batches is None:
+        data = cast(Data, csr)
+    else:
+        data = (row for rows in ordered_map(batch_rows, result_batches, download_threads) for row in rows)
+    truncated: list[int] = []
+    if limit is None:
+        data = take(data, truncated=truncated.append)
+    elif limit > 0:
+        data = islice(data, limit)
+    if save is not None:
+        data = save(names, types, data, lambda: next(iter(truncated), None))
 
     export(data, headers, types)
 
@@ -74,8 +253,18 @@ def run(
     limit: int | None = None,
     file: Path | None = None,
     pretty_headers: bool = False,
+    columnar: bool = False,
+    download_threads: int = 1,
 ) -> None:
-    return _run(csr, sql, export=format.export(file), limit=limit, pretty_headers=pretty_headers)
+    return _run(
+        csr,
+        sql,
+        export=format.export(file),
+        limit=limit,
+        pretty_headers=pretty_headers,
+        columnar=columnar,
+        download_threads=download_threads,
+    )
 
 
 def print_meta(csr: SnowflakeCursor, sql: str, format: Format = Format.default(), file: Path | None = None, **kwargs: Any):
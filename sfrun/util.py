@@ -1,17 +1,25 @@
 "Utility types and functions"
 
-import sys
 from argparse import ArgumentTypeError
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum, auto
+from itertools import islice
 from logging import getLogger
 from pathlib import Path
-from typing import Any, Callable, Iterable, TextIO, TypeAlias, TypeVar
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, TextIO, TypeAlias, TypeVar
 
-from snowflake.snowpark import DataFrame, Session
+from .compress import OutputFile
+from .sink import BUFFER_SIZE, open_sink, stdout_binary
+
+if TYPE_CHECKING:
+    from snowflake.snowpark import DataFrame, Session
 
 Data: TypeAlias = Iterable[tuple[Any, ...]]
 ExportFn = Callable[[Data, list[str], list[type]], None]
-SnowparkFn: TypeAlias = Callable[[Session], DataFrame | str]
+ArrowData: TypeAlias = Iterable[Any]  # pyarrow.Table batches, as returned by SnowflakeCursor.fetch_arrow_batches()
+ArrowExportFn = Callable[[ArrowData, list[str], list[type]], None]
+SnowparkFn: TypeAlias = "Callable[[Session], DataFrame | str]"
 T = TypeVar("T")
 U = TypeVar("U")
 
@@ -27,26 +35,74 @@ class Command(Enum):
     SHOW_SCHEMA = auto()
 
 
-def intersperse(fn: Callable[[T], U], xs: Iterable[T]) -> Iterable[U]:
-    "add a new line between items and return and Iterable over input mapped by fn"
+def intersperse(fn: Callable[[T], U], xs: Iterable[T], file: TextIO | None = None) -> Iterable[U]:
+    "add a new line (printed to file, default stdout) between items and return and Iterable over input mapped by fn"
     is_first = True
     for x in xs:
         if is_first:
             is_first = False
         else:
-            print()
+            print(file=file)
         yield fn(x)
 
 
+def ordered_map(
+    fn: Callable[[T], U],
+    xs: Iterable[T],
+    threads: int,
+    in_flight: int | None = None,
+    stop: Callable[[U], bool] | None = None,
+) -> Iterator[U]:
+    """map fn over xs on a pool of threads, yielding results in the input order; at most `in_flight` (default
+    2 x threads) results are computed ahead of the one being consumed, which bounds memory use. Once stop is true
+    for a result, no more items are started, and results of items that had already started follow it"""
+    it = iter(xs)
+    with ThreadPoolExecutor(threads) as pool:
+        pending: deque[Future[U]] = deque(pool.submit(fn, x) for x in islice(it, in_flight or 2 * threads))
+        try:
+            while pending:
+                result = pending.popleft().result()
+                if stop is not None and stop(result):
+                    it = iter(())
+                    pending = deque(f for f in pending if not f.cancel())
+                for x in islice(it, 1):
+                    pending.append(pool.submit(fn, x))
+                yield result
+        finally:
+            for f in pending:
+                f.cancel()
+
+
 def textio(
     fn: Callable[[Data, list[str], list[type], TextIO], None],
-) -> Callable[[Data, list[str], list[type], Path | None], None]:
-    def wrapped(rows: Data, headers: list[str], types: list[type], output: Path | None):
+) -> Callable[..., None]:
+    "adapt a writer of text streams to write to a file, or to stdout if output is None, through a buffered Sink"
+
+    def wrapped(
+        rows: Data,
+        headers: list[str],
+        types: list[type],
+        output: Path | OutputFile | None,
+        buffer_size: int = BUFFER_SIZE,
+    ):
+        with open_sink(output, buffer_size) as f:
+            fn(rows, headers, types, f)  # type: ignore
+        logger.info(f"{f.bytes_written:,} bytes written to {getattr(output, 'path', output) or 'stdout'}")
+
+    return wrapped
+
+
+def binio(fn: Callable[..., None]) -> Callable[..., None]:
+    "adapt a writer of binary streams to write to a file, or to stdout if output is None; options are passed to fn"
+
+    def wrapped(data: Any, headers: list[str], types: list[type], output: Path | OutputFile | None, **options: Any):
         if output is None:
-            fn(rows, headers, types, sys.stdout)
+            f = stdout_binary()
+            fn(data, headers, types, f, **options)
+            f.flush()
         else:
-            with output.open("w") as f:
-                fn(rows, headers, types, f)
+            with output.open("wb") as f:
+                fn(data, headers, types, f, **options)
 
     return wrapped
 
@@ -60,16 +116,41 @@ def natural(v: str) -> int:
     raise ArgumentTypeError("must be a positive whole number")
 
 
+def positive(v: str) -> int:
+    if (n := natural(v)) > 0:
+        return n
+    raise ArgumentTypeError("must be a number greater than zero")
+
+
 def prettify(headers: Iterable[str]) -> list[str]:
     return [x.replace("_", " ").title() for x in headers]
 
 
-def take(data: Data, limit: int | None = None) -> Data:
+def take(data: Data, limit: int | None = None, truncated: Callable[[int], None] | None = None) -> Data:
+    "first limit (default SOFT_LIMIT) rows; if there are more, a warning is logged and truncated, if given, is called"
     if limit is None:
         limit = SOFT_LIMIT
 
     for e, row in enumerate(data, start=1):
         if e > limit:
             logger.warning(f"data truncated after {limit} rows")
+            if truncated is not None:
+                truncated(limit)
             return
         yield row
+
+
+def take_batches(batches: ArrowData, limit: int | None = None, warn: bool = True) -> ArrowData:
+    if limit is None:
+        limit = SOFT_LIMIT
+
+    remaining = limit
+    for b in batches:
+        if b.num_rows > remaining:
+            if warn:
+                logger.warning(f"data truncated after {limit} rows")
+            if remaining > 0:
+                yield b.slice(0, remaining)
+            return
+        remaining -= b.num_rows
+        yield b
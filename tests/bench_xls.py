@@ -0,0 +1,77 @@
+"""Benchmark Excel export throughput: python -m tests.bench_xls [ROWS]
+
+Compares the openpyxl and, if installed, xlsxwriter backends of sfrun.formats.xls against the previous implementation
+that created and styled a new cell for every value.
+"""
+
+import datetime as dt
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+from openpyxl import Workbook
+from openpyxl.cell import Cell, WriteOnlyCell  # type: ignore
+from openpyxl.styles import Font
+
+from sfrun.formats import xls
+
+headers = ["ID", "NAME", "AMOUNT", "RATIO", "CREATED", "DAY", "AT"]
+types = [int, str, Decimal, float, dt.datetime, dt.date, dt.time]
+
+
+def sample(n: int) -> list[tuple[Any, ...]]:
+    ts = dt.datetime(2000, 1, 1, 12, 30)
+    return [(i, f"name {i}", Decimal("12.34"), i / 7, ts, ts.date(), ts.time()) for i in range(n)]
+
+
+def per_cell(rows: list[tuple[Any, ...]], file: Path) -> None:
+    "previous implementation: a new styled cell for each value"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()  # type: ignore
+    font, fmts = Font("Hack"), [xls.num_fmt(t) for t in types]
+
+    def cell(v: Any, f: str) -> Cell | None:
+        if v is None:
+            return None
+        c = WriteOnlyCell(ws, value=v)
+        c.font = font
+        c.number_format = f
+        return c
+
+    for row in rows:
+        ws.append([cell(v, f) for v, f in zip(row, fmts)])  # type: ignore
+    wb.save(file)  # type: ignore
+
+
+def shared_styles(book: Callable[[Path], xls.Book]) -> Callable[[list[tuple[Any, ...]], Path], None]:
+    def run(rows: list[tuple[Any, ...]], file: Path) -> None:
+        b = book(file)
+        xls.write_sheet(b, "Sheet1", rows, headers, types)
+        b.close()
+
+    return run
+
+
+def main(n: int) -> None:
+    rows = sample(n)
+    candidates: dict[str, Callable[[list[tuple[Any, ...]], Path], None]] = {
+        "per-cell styles (before)": per_cell,
+        "openpyxl, shared styles": shared_styles(xls.OpenpyxlBook),
+    }
+    if xls.xlsxwriter is not None:
+        candidates["xlsxwriter, column formats"] = shared_styles(xls.XlsxwriterBook)
+
+    with tempfile.TemporaryDirectory() as d:
+        for name, fn in candidates.items():
+            start = time.perf_counter()
+            fn(rows, Path(d) / "bench.xlsx")
+            elapsed = time.perf_counter() - start
+            print(f"{name:30} {n / elapsed:>12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
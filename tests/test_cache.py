@@ -0,0 +1,101 @@
+"test local result cache"
+
+import os
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from pytest import LogCaptureFixture
+
+from sfrun.cache import ResultCache, normalize, read_only
+
+cnx: Any = SimpleNamespace(account="acct", user="me", role="r", warehouse="wh", database="db", schema="s")
+rows = [(1, "one"), (2, "two")]
+
+
+def test_normalize():
+    assert normalize("  select  1,\n\t'a  b'  from\n t ") == "select 1, 'a  b' from t"
+
+
+def test_roundtrip(tmp_path: Path):
+    cache = ResultCache(tmp_path, ttl=60)
+    assert cache.get(cnx, "select 1", None) is None
+
+    assert list(cache.put(cnx, "select 1", None, ["C1", "C2"], [int, str], rows)) == rows
+    assert cache.contains(cnx, "select   1", None)
+    assert not cache.contains(cnx, "select 1", 10)
+
+    cached = cache.get(cnx, "select 1", None)
+    assert cached is not None
+    names, types, data = cached
+    assert (names, types, list(data)) == (["C1", "C2"], [int, str], rows)
+
+
+def test_partial_not_saved(tmp_path: Path):
+    cache = ResultCache(tmp_path, ttl=60)
+    it = iter(cache.put(cnx, "select 1", None, ["C1", "C2"], [int, str], rows))
+    next(it)
+    del it
+    assert not cache.contains(cnx, "select 1", None)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_expiry(tmp_path: Path):
+    cache = ResultCache(tmp_path, ttl=60)
+    list(cache.put(cnx, "select 1", None, ["C1", "C2"], [int, str], rows))
+    (p,) = tmp_path.iterdir()
+    os.utime(p, (time.time(), time.time() - 61))
+    assert cache.get(cnx, "select 1", None) is None
+    assert not p.exists()
+
+
+def test_lru_eviction(tmp_path: Path):
+    cache = ResultCache(tmp_path, ttl=60)
+    for e, sql in enumerate(["select 1", "select 2", "select 3"]):
+        list(cache.put(cnx, sql, None, ["C1", "C2"], [int, str], rows))
+        p = cache._path(cnx, sql, None)
+        os.utime(p, (time.time() - 10 + e, p.stat().st_mtime))
+    cache.get(cnx, "select 1", None)  # now the most recently used
+
+    cache.max_size = 2 * p.stat().st_size
+    cache.evict()
+    assert cache.contains(cnx, "select 1", None)
+    assert not cache.contains(cnx, "select 2", None)
+    assert cache.contains(cnx, "select 3", None)
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("select 1", True),
+        ("  -- comment\n/* block */ (SELECT 1)", True),
+        ("with t as (select 1) select * from t", True),
+        ("show tables", True),
+        ("desc table t", True),
+        ("delete from t", False),
+        ("insert into t select 1", False),
+        ("create table t as select 1", False),
+        ("selected_proc()", False),
+    ],
+)
+def test_read_only(sql: str, expected: bool):
+    assert read_only(sql) is expected
+
+
+def test_dml_not_cached(tmp_path: Path):
+    cache = ResultCache(tmp_path, ttl=60)
+    result = [(3,)]
+    assert list(cache.put(cnx, "delete from t", None, ["number of rows deleted"], [int], result)) == result
+    assert not cache.contains(cnx, "delete from t", None)
+    assert cache.get(cnx, "delete from t", None) is None
+    assert not tmp_path.exists() or list(tmp_path.iterdir()) == []
+
+
+def test_truncated(tmp_path: Path, caplog: LogCaptureFixture):
+    cache = ResultCache(tmp_path, ttl=60)
+    list(cache.put(cnx, "select 1", None, ["C1", "C2"], [int, str], rows, lambda: 2))
+    cached = cache.get(cnx, "select 1", None)
+    assert cached is not None and list(cached[2]) == rows
+    assert "data truncated after 2 rows" in caplog.text
@@ -0,0 +1,30 @@
+"test per-column value converters"
+
+import datetime as dt
+from decimal import Decimal
+
+from sfrun.formats.codec import json_value, map_rows, naive, text
+
+utc = dt.UTC
+
+
+def test_map_rows_passthrough():
+    rows = [(1, "a")]
+    assert map_rows(rows, [None, None]) is rows
+
+
+def test_map_rows_some_columns():
+    rows = [(1, Decimal("1.10"), "a"), (2, None, None)]
+    assert list(map_rows(rows, [None, json_value(Decimal), json_value(str)])) == [[1, "1.10", "a"], [2, None, None]]
+
+
+def test_text():
+    conv = [text(int, null="None"), text(str, null="None"), text(dt.datetime)]
+    assert list(map_rows([(1, None, dt.datetime(2000, 1, 1, tzinfo=utc))], conv)) == [["1", "None", "2000-01-01 00:00:00+00:00"]]
+
+
+def test_naive():
+    conv = [naive(dt.datetime), naive(dt.time), naive(str)]
+    assert list(map_rows([(dt.datetime(2000, 1, 1, tzinfo=utc), dt.time(1, tzinfo=utc), "x")], conv)) == [
+        [dt.datetime(2000, 1, 1), dt.time(1), "x"]
+    ]
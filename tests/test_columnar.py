@@ -0,0 +1,75 @@
+"test Arrow-aware writers produce the same output as the row based writers"
+
+import contextlib
+import datetime as dt
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from pytest import CaptureFixture
+
+from sfrun import Format
+
+pa = pytest.importorskip("pyarrow")
+
+headers = ["C1", "C2", "C3", "C4", "C5", "C6", "C7", "C8"]
+types = [int, str, Decimal, float, dt.date, dt.time, dt.datetime, bool]
+rows = [
+    (1, "one", Decimal("1.1000"), 1.1, dt.date(2000, 1, 1), dt.time(11, 1, 1), dt.datetime(2000, 1, 1, 11, 1, 1), True),
+    (2, 'a "quoted", value', Decimal("2.2200"), 2.22, None, dt.time(12, 2, 22), dt.datetime(2000, 1, 1, 12, 2, 22, 5), False),
+    (None, "tab\tand\nnewline", None, None, dt.date(2000, 3, 3), None, None, None),
+]
+
+
+def as_batches(rows: list[tuple]) -> list:
+    return [pa.table({h: list(c) for h, c in zip(headers, zip(*rows))})]
+
+
+@pytest.mark.parametrize("fmt", [Format.CSV, Format.TSV, Format.RAW, Format.JSONL])
+def test_same_as_rows(fmt: Format, capsys: CaptureFixture[str]):
+    export = fmt.export()
+    assert export.arrow is not None
+
+    export(rows, headers, types)
+    expected = capsys.readouterr().out
+
+    export.arrow(as_batches(rows), headers, types)
+    actual = capsys.readouterr().out
+
+    if fmt is Format.JSONL:
+        assert [json.loads(x) for x in actual.splitlines()] == [json.loads(x) for x in expected.splitlines()]
+    else:
+        assert actual == expected
+
+
+def test_row_only_format():
+    assert Format.FMT.export().arrow is None
+
+
+def test_json_special_values(capsys: CaptureFixture[str]):
+    "NaN and infinity are null, and timestamps keep the same offsets, as in the row-based writer"
+    hdrs, typs = ["C1", "C2"], [float, dt.datetime]
+    utc, ist = dt.UTC, dt.timezone(dt.timedelta(hours=5, minutes=30))
+    data = [(float("nan"), dt.datetime(2000, 1, 1, 11, 1, 1, tzinfo=utc)), (float("-inf"), dt.datetime(2000, 1, 1, tzinfo=utc))]
+    export = Format.JSONL.export()
+
+    export(data, hdrs, typs)
+    expected = capsys.readouterr().out
+
+    for tz in ["UTC", "+05:30"]:
+        batch = pa.table({"C1": [v for v, _ in data], "C2": pa.array([t for _, t in data], pa.timestamp("us", tz=tz))})
+        export.arrow([batch], hdrs, typs)
+        actual = capsys.readouterr().out
+        if tz == "UTC":
+            assert actual == expected
+        assert [json.loads(x)["C1"] for x in actual.splitlines()] == [None, None]
+
+    assert json.loads(actual.splitlines()[0])["C2"] == str(data[0][1].astimezone(ist))
+
+
+def test_redirected_stdout():
+    "stdout replaced by a text stream, which has no binary buffer"
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        Format.CSV.export().arrow(as_batches(rows[:1]), headers, types)  # type: ignore
+    assert out.getvalue().startswith("C1,C2,C3,C4,C5,C6,C7,C8\r\n1,one,1.1000,")
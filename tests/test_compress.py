@@ -0,0 +1,56 @@
+"test compressed text exports"
+
+import bz2
+import gzip
+import io
+from pathlib import Path
+
+import pytest
+
+from sfrun.compress import CompressedWriter, Compression
+from sfrun.formats import Format
+
+headers = ["C1", "C2"]
+types = [int, str]
+rows = [(e, f"row {e}") for e in range(10_000)]
+expected = "C1,C2\r\n" + "".join(f"{e},row {e}\r\n" for e in range(10_000))
+
+
+def test_from_extension(tmp_path: Path):
+    out = tmp_path / "out.csv.gz"
+    Format.CSV.export(out)(rows, headers, types)
+    with gzip.open(out, "rt", newline="") as f:
+        assert f.read() == expected
+
+
+def test_explicit(tmp_path: Path):
+    out = tmp_path / "out.csv"
+    Format.CSV.export(out, compress=Compression.BZ2)(rows, headers, types)
+    with bz2.open(out, "rt", newline="") as f:
+        assert f.read() == expected
+
+
+def test_zstd(tmp_path: Path):
+    zstd = pytest.importorskip("zstandard")
+    out = tmp_path / "out.csv.zst"
+    Format.CSV.export(out)(rows, headers, types)
+    assert zstd.ZstdDecompressor().decompressobj().decompress(out.read_bytes()).decode() == expected
+
+
+def test_stdout(capfdbinary: pytest.CaptureFixture[bytes]):
+    Format.CSV.export(compress=Compression.GZIP)(rows, headers, types)
+    assert gzip.decompress(capfdbinary.readouterr().out).decode() == expected
+
+
+def test_error():
+    "errors writing to the target, on the compression thread, are raised in the writer"
+
+    class Full(io.BytesIO):
+        def write(self, b) -> int:  # type: ignore
+            raise OSError("no space left on device")
+
+    w = CompressedWriter(Full(), Compression.GZIP)
+    with pytest.raises(OSError, match="no space"):
+        for _ in range(100):
+            w.write(b"x" * 1024)
+        w.close()
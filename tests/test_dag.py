@@ -0,0 +1,76 @@
+"test dependencies between batch scripts"
+
+import time
+from pathlib import Path
+
+import pytest
+
+from sfrun.batch import cli
+from sfrun.dag import dependencies, header_depends, run_graph, waves
+
+
+def scripts(tmp_path: Path, **texts: str) -> list[Path | str | None]:
+    paths: list[Path | str | None] = []
+    for name, text in texts.items():
+        (path := tmp_path / f"{name}.sql").write_text(text)
+        paths.append(path)
+    return paths
+
+
+def test_header_depends():
+    text = "-- deploy views\n--depends: a.sql, b.sql\n-- Depends: c.sql\n\nselect 1;\n-- depends: d.sql\n"
+    assert header_depends(text) == ["a.sql", "b.sql", "c.sql"]
+
+
+def test_dependencies(tmp_path: Path):
+    paths = scripts(tmp_path, a="select 1;", b="-- depends: a.sql\nselect 2;", c="-- depends: b.sql, x.sql\nselect 3;")
+    assert dependencies(paths) == [set(), {0}, {1}]
+
+
+def test_infer(tmp_path: Path):
+    paths = scripts(
+        tmp_path,
+        v="create or replace view v1 as select * from t1;",
+        t="create or replace transient table T1 (c int);",
+        u="-- refers to v1 only in a comment\ncreate table t1 (c int);",
+        w="select 1 as t1;",
+    )
+    assert dependencies(paths) == [set(), set(), set(), set()]
+    assert dependencies(paths, infer=True) == [{1, 2}, set(), set(), set()]
+
+
+def test_waves():
+    assert waves([set(), {0}, set(), {1, 2}]) == [[0, 2], [1], [3]]
+    with pytest.raises(ValueError):
+        waves([{1}, {0}])
+
+
+def test_cycle(tmp_path: Path):
+    "a cycle is reported before connecting"
+    paths = scripts(tmp_path, a="-- depends: b.sql\nselect 1;", b="-- depends: a.sql\nselect 2;")
+    with pytest.raises(SystemExit, match="circular dependency"):
+        cli([str(p) for p in paths])
+
+
+def test_run_graph_concurrent():
+    started: list[int] = []
+
+    def fn(e: int) -> bool:
+        started.append(e)
+        time.sleep(0.05)
+        return True
+
+    results = list(run_graph([set(), set(), {0, 1}], fn, bool, jobs=2))
+    assert started[-1] == 2 and sorted(started[:2]) == [0, 1]
+    assert sorted(results) == [(0, True), (1, True), (2, True)]
+
+
+def test_run_graph_skip():
+    deps = [set(), {0}, {1}, set()]
+    assert sorted(run_graph(deps, lambda e: e != 0, bool, stop=False), key=str) == sorted(
+        [(0, False), (1, None), (2, None), (3, True)], key=str
+    )
+
+
+def test_run_graph_stop():
+    assert list(run_graph([set(), {0}, set()], lambda e: e != 0, bool, stop=True)) == [(0, False)]
@@ -0,0 +1,41 @@
+"guard CLI startup time against modules being imported eagerly"
+
+import subprocess
+import sys
+
+import pytest
+
+BUDGET_US = 50_000  # total self time of sfrun's own modules, in microseconds
+
+
+def imported(stmt: str) -> dict[str, int]:
+    "modules imported by stmt, run in a fresh interpreter, with their self import time in microseconds"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", stmt], capture_output=True, text=True, check=True)
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            self_us, _, name = line.removeprefix("import time:").split("|")
+            if self_us.strip().isdigit():
+                times[name.strip()] = int(self_us)
+    return times
+
+
+def test_package():
+    assert not any(m.split(".")[0] in ("snowflake", "sfconn", "openpyxl") for m in imported("import sfrun"))
+
+
+def test_client():
+    "the client forwards commands to the daemon, and must start quickly"
+    assert not any(m.split(".")[0] in ("snowflake", "sfconn", "yappt") for m in imported("import sfrun.client"))
+
+
+@pytest.mark.parametrize("fmt", ["FMT", "CSV", "JSON", "JSONL"])
+def test_format(fmt: str):
+    modules = imported(f"from sfrun.formats import Format; Format.{fmt}.export()")
+    assert not any(m.split(".")[0] in ("openpyxl", "xlsxwriter", "pyarrow", "snowflake") for m in modules)
+
+
+def test_cli():
+    modules = imported("import sfrun.main")
+    assert not any(m in modules for m in ("sfrun.df", "sfrun.formats.xls", "openpyxl", "xlsxwriter"))
+    assert sum(t for m, t in modules.items() if m.split(".")[0] == "sfrun") < BUDGET_US
@@ -0,0 +1,31 @@
+"test coalescing of inserts"
+
+from itertools import groupby
+
+from sfrun.inserts import chunks, coalesce, split, target
+
+
+def test_split():
+    assert split("insert into t values (1, 'a')") == ("t", "(1, 'a')")
+    sql = "INSERT  INTO db.s.\"T x\" (a, b)\nVALUES (1, 'x;'), (2, '(');"
+    assert split(sql) == ('db.s."T x" (a, b)', "(1, 'x;'), (2, '(')")
+    assert split("insert into t select * from u") is None
+    assert split("insert overwrite into t values (1)") is None
+    assert split("update t set x = 1") is None
+
+
+def test_target():
+    sqls = ["insert into t values (1)", "insert  into T\nvalues (2)", "insert into t (x) values (3)", "select 1"]
+    assert [target(s) for s in sqls] == ["t", "T", "t (x)", None]
+
+
+def test_chunks():
+    stmts = [(n, "x" * n) for n in range(1, 8)]
+    assert [[n for n, _ in c] for c in chunks(stmts, max_rows=3, max_chars=10)] == [[1, 2, 3], [4, 5], [6], [7]]
+
+
+def test_coalesce():
+    sqls = ["insert into t values (1)", "insert into t values (2), (3);", "insert into t values (4)", "select 1"]
+    runs = [list(g) for _, g in groupby(sqls, key=target)]
+    assert coalesce(runs[0]) == "insert into t values\n(1),\n(2), (3),\n(4)"
+    assert runs[1] == ["select 1"]
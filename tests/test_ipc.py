@@ -0,0 +1,48 @@
+"test Arrow IPC stream export"
+
+import datetime as dt
+import subprocess
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from sfrun import Format
+
+pa = pytest.importorskip("pyarrow")
+
+headers = ["C1", "C2", "C3", "C4"]
+types = [int, str, Decimal, dt.date]
+rows = [(1, "one", Decimal("1.10"), dt.date(2000, 1, 1)), (2, None, Decimal("2.22"), None)]
+
+
+def test_rows(tmp_path: Path):
+    out = tmp_path / "out.arrow"
+    Format.ARROW.export(out)(rows, headers, types)
+
+    t = pa.ipc.open_stream(out.read_bytes()).read_all()
+    assert t.schema.field("C3").type == pa.decimal128(38, 2)
+    assert [tuple(r.values()) for r in t.to_pylist()] == rows
+
+
+def test_arrow_batches(tmp_path: Path):
+    out = tmp_path / "out.arrow"
+    batches = [pa.table({"a": [1, 2], "b": ["x", None]}), pa.table({"a": [3], "b": ["z"]})]
+    Format.ARROW.export(out).arrow(batches, ["A", "B"], [int, str])  # type: ignore
+
+    with pa.ipc.open_stream(out.read_bytes()) as reader:
+        assert reader.schema.names == ["A", "B"]
+        assert [b.num_rows for b in reader] == [2, 1]
+
+
+def test_empty(tmp_path: Path):
+    out = tmp_path / "out.arrow"
+    Format.ARROW.export(out)([], headers, types)
+    assert pa.ipc.open_stream(out.read_bytes()).read_all().column_names == headers
+
+
+def test_stdout():
+    code = "from sfrun import Format; Format.ARROW.export()([(1, 'a')], ['C1', 'C2'], [int, str])"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True).stdout
+    assert pa.ipc.open_stream(out).read_all().to_pylist() == [{"C1": 1, "C2": "a"}]
@@ -0,0 +1,72 @@
+"test journal of completed statements"
+
+from contextlib import closing
+from pathlib import Path
+
+from sfrun.journal import Journal
+from sfrun.runner import SqlRunner, SqlScript
+
+SQLS = ["create table t(x int)", "insert into t values (1)", "select * from t"]
+
+
+def first(j: Journal, name: str, sqls: list[str]) -> int:
+    "number of the first statement to run, 0 if all completed"
+    return next(iter(SqlRunner(sqls, journal=j, name=name).pending(sqls)), (0, ""))[0]
+
+
+def record(path: Path, n: int, resume: bool = False) -> None:
+    with closing(Journal(path, resume=resume)) as j:
+        for e, sql in enumerate(SQLS[:n], start=1):
+            j.record("a.sql", e, sql)
+
+
+def test_resume(tmp_path: Path):
+    record(path := tmp_path / "journal.jsonl", 2)
+    with closing(Journal(path, resume=True)) as j:
+        assert j.completed("a.sql", 1, SQLS[0])
+        assert j.completed("a.sql", 2, "  " + SQLS[1] + "\n")  # surrounding white space is not a change
+        assert not j.completed("a.sql", 3, SQLS[2])
+        assert not j.completed("b.sql", 1, SQLS[0])
+        assert first(j, "a.sql", SQLS) == 3
+        assert first(j, "b.sql", SQLS) == 1
+
+
+def test_edited(tmp_path: Path):
+    record(path := tmp_path / "journal.jsonl", 3)
+    with closing(Journal(path, resume=True)) as j:
+        sqls = [SQLS[0], "insert into t values (2)", SQLS[2]]
+        assert first(j, "a.sql", sqls) == 2
+
+
+def test_gaps(tmp_path: Path):
+    "statements recorded after one that didn't complete are skipped too"
+    with closing(Journal(path := tmp_path / "journal.jsonl")) as j:
+        j.record("a.sql", 1, SQLS[0])
+        j.record("a.sql", 3, SQLS[2])
+    with closing(Journal(path, resume=True)) as j:
+        assert list(SqlRunner(SQLS, journal=j, name="a.sql").pending(SQLS)) == [(2, SQLS[1])]
+
+
+def test_no_resume(tmp_path: Path):
+    record(path := tmp_path / "journal.jsonl", 3)
+    record(path, 1)  # a new run starts a new journal
+    with closing(Journal(path, resume=True)) as j:
+        assert first(j, "a.sql", SQLS) == 2
+
+
+def test_truncated(tmp_path: Path):
+    record(path := tmp_path / "journal.jsonl", 2)
+    with path.open("a") as f:
+        f.write('{"script": "a.sql", "statem')
+    with closing(Journal(path, resume=True)) as j:
+        assert first(j, "a.sql", SQLS) == 3
+        j.record("a.sql", 3, SQLS[2])
+    with closing(Journal(path, resume=True)) as j:
+        assert first(j, "a.sql", SQLS) == 0
+
+
+def test_query_names():
+    "queries, which have no file name, are told apart in the journal by their text"
+    a, b = SqlScript(";".join(SQLS)), SqlScript(SQLS[0])
+    assert a.name != b.name
+    assert a.name == SqlScript(";".join(SQLS)).name
@@ -0,0 +1,70 @@
+"test JSON array output"
+
+import datetime as dt
+import json
+from decimal import Decimal
+
+import pytest
+from pytest import CaptureFixture
+
+from sfrun import Format
+
+headers = ["C1", "C2", "C3", "C4", "C5", "C6"]
+types = [int, str, Decimal, float, dt.datetime, bool]
+rows = [
+    (1, "one", Decimal("1.1000"), 1.1, dt.datetime(2000, 1, 1, 11, 1, 1), True),
+    (2, 'quote " and é', None, None, None, False),
+    (10**30, None, Decimal("-3.3"), 3.333, dt.datetime(2000, 1, 3, 13, 3, 44), None),
+]
+
+
+def reference(rows: list[tuple], headers: list[str]) -> str:
+    "output of the original implementation that dumped each row with indent and re-indented it"
+
+    def to_json(v):
+        return v if v is None or isinstance(v, str | int | float | bool) else str(v)
+
+    dumps = [json.dumps({h: to_json(v) for h, v in zip(headers, r)}, indent=2) for r in rows]
+    docs = ["\n".join("  " + y for y in d.splitlines()) for d in dumps]
+    return "[\n" + "".join(d + ("," if e < len(docs) - 1 else "") + "\n" for e, d in enumerate(docs)) + "]\n"
+
+
+@pytest.mark.parametrize("data", [rows, []])
+def test_indented(data: list[tuple], capsys: CaptureFixture[str]):
+    Format.JSON.export()(data, headers, types)
+    assert capsys.readouterr().out == reference(data, headers)
+
+
+def test_compact(capsys: CaptureFixture[str]):
+    Format.JSON.export(compact=True)(rows, headers, types)
+    out = capsys.readouterr().out
+    assert len(out.splitlines()) == len(rows) + 2
+    assert json.loads(out) == json.loads(reference(rows, headers))
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+def test_compact_bytes(with_orjson: bool, monkeypatch: pytest.MonkeyPatch, capsys: CaptureFixture[str]):
+    "compact output is the same with and without orjson"
+    if with_orjson:
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr("sfrun.formats.json.orjson", None)
+
+    data = [*rows, (3, "tab\t, ctrl \x1f, \\ /", Decimal(4), 1e16, dt.datetime(2000, 1, 1, tzinfo=dt.UTC), True)]
+    data.append((4, None, None, float("nan"), None, None))
+    Format.JSON.export(compact=True)(data, headers, types)
+    assert capsys.readouterr().out == (
+        "[\n"
+        '{"C1":1,"C2":"one","C3":"1.1000","C4":1.1,"C5":"2000-01-01 11:01:01","C6":true},\n'
+        '{"C1":2,"C2":"quote \\" and é","C3":null,"C4":null,"C5":null,"C6":false},\n'
+        '{"C1":1000000000000000000000000000000,"C2":null,"C3":"-3.3","C4":3.333,"C5":"2000-01-03 13:03:44","C6":null},\n'
+        '{"C1":3,"C2":"tab\\t, ctrl \\u001f, \\\\ /","C3":"4","C4":1e16,"C5":"2000-01-01 00:00:00+00:00","C6":true},\n'
+        '{"C1":4,"C2":null,"C3":null,"C4":null,"C5":null,"C6":null}\n'
+        "]\n"
+    )
+
+
+def test_repeated_headers(capsys: CaptureFixture[str]):
+    "as in a dict of the row, the last value of a repeated header is kept"
+    Format.JSON.export(compact=True)([(1, 2, 3)], ["A", "B", "A"], [int, int, int])
+    assert capsys.readouterr().out == '[\n{"A":3,"B":2}\n]\n'
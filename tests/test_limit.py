@@ -6,6 +6,7 @@ from pytest import CaptureFixture
 from snowflake.connector import SnowflakeConnection
 
 from sfrun.batch import run
+from sfrun.main import getargs, main
 
 
 def test_two_rows(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
@@ -23,3 +24,10 @@ select $1 from values (1), (2), (3) order by 1;
 +----+
 """
     assert actual == expected
+
+
+def test_table_show_sql(capsys: CaptureFixture[str]) -> None:
+    "the limit is pushed into the query of a table when it is run, and is not part of the SQL that is shown"
+    main(**vars(getargs(["-t", "x", "--show-sql"])))
+    main(**vars(getargs(["-t", "x", "--limit", "5", "--show-sql"])))
+    assert capsys.readouterr().out == "select * from x;\nselect * from x;\n"
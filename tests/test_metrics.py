@@ -0,0 +1,48 @@
+"test statement metrics"
+
+import json
+from contextlib import closing
+from io import StringIO
+from pathlib import Path
+
+from sfrun.metrics import Metrics, StatementMetrics
+
+
+def test_metrics(tmp_path: Path):
+    with closing(Metrics(path := tmp_path / "metrics.jsonl")) as m:
+        m.record(StatementMetrics("a.sql", 1, "q1", True, 0.5, 0.25, 10, 100))
+        m.record(StatementMetrics("a.sql", 2, "q2", False, 2.0))
+        m.record(StatementMetrics("b.sql", 1, None, True, None, 1.0, 1, 20))
+        m.record(StatementMetrics("b.sql", 2, "q4", True, 0.1, last=9))
+
+        out = StringIO()
+        m.profile(out, top=2)
+
+    lines = [json.loads(x) for x in path.read_text().splitlines()]
+    assert [(x["script"], x["statement"], x["last"]) for x in lines] == [
+        ("a.sql", 1, None),
+        ("a.sql", 2, None),
+        ("b.sql", 1, None),
+        ("b.sql", 2, 9),
+    ]
+    assert lines[0] == {
+        "script": "a.sql",
+        "statement": 1,
+        "query_id": "q1",
+        "ok": True,
+        "execute_secs": 0.5,
+        "fetch_secs": 0.25,
+        "rows": 10,
+        "bytes": 100,
+        "last": None,
+    }
+
+    rows = [r for r in out.getvalue().splitlines() if r.startswith("| ") and "Script" not in r]
+    assert [r.split("|")[3].strip() for r in rows] == ["q2", ""]  # slowest first: q2 (2s), then b.sql (1s)
+    assert out.getvalue().splitlines()[-1] == "2 slowest of 4 statements; 3.85s in all"
+
+
+def test_range():
+    "statements run as one are labelled with their range"
+    assert StatementMetrics("a.sql", 2, "q", True, last=9).label == "2-9"
+    assert StatementMetrics("a.sql", 2, "q", True).label == "2"
@@ -3,6 +3,7 @@
 from pathlib import Path
 
 from pytest import CaptureFixture
+from sfconn import getconn
 from snowflake.connector import SnowflakeConnection
 
 from sfrun.batch import ErrorAction, run
@@ -42,3 +43,43 @@ def test_error_skip_file(tmp_path: Path, cnx: SnowflakeConnection, capsys: Captu
     assert "one" in actual
     assert "two" not in actual
     assert "three" in actual
+
+
+def test_jobs(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
+    sqlfs = [tmp_path / f"test{e}.sql" for e in range(4)]
+    for e, f in enumerate(sqlfs):
+        f.write_text(f"select 'first {e}'; select system$wait({4 - e}); select 'last {e}';")
+
+    assert run(cnx, sqlfs, jobs=4, connect=getconn) == 0
+
+    actual = capsys.readouterr().out
+    positions = [actual.index(f"{x} {e}") for e in range(4) for x in ["first", "last"]]
+    assert positions == sorted(positions)
+
+
+def test_jobs_skip_file(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
+    sqlf = tmp_path / "test.sql"
+    sqlf.write_text("select 'one'; selec current_u(); select 'two';")
+
+    sqlf2 = tmp_path / "test2.sql"
+    sqlf2.write_text("select 'three';")
+
+    assert run(cnx, [sqlf, sqlf2], on_error=ErrorAction.SKIP_FILE, jobs=2, connect=getconn) == 1
+
+    actual = capsys.readouterr().out
+    assert "one" in actual
+    assert "two" not in actual
+    assert "three" in actual
+
+
+def test_jobs_stop(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
+    sqlf = tmp_path / "test.sql"
+    sqlf.write_text("selec current_u();")
+
+    sqlf2 = tmp_path / "test2.sql"
+    sqlf2.write_text("select system$wait(2); select 'two';")
+
+    # test2.sql started before test.sql failed, and its output is still printed
+    assert run(cnx, [sqlf, sqlf2], jobs=2, connect=getconn) == 1
+
+    assert "two" in capsys.readouterr().out
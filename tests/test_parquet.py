@@ -0,0 +1,67 @@
+"test Parquet export keeps native types"
+
+import datetime as dt
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from sfrun import Format
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+headers = ["C1", "C2", "C3", "C4", "C5", "C6", "C7"]
+types = [int, str, Decimal, float, dt.date, dt.time, dt.datetime]
+rows = [
+    (1, "one", Decimal("1.1000"), 1.1, dt.date(2000, 1, 1), dt.time(11, 1, 1), dt.datetime(2000, 1, 1, 11, 1, 1)),
+    (2, None, Decimal("2.2200"), 2.22, None, dt.time(12, 2, 22), dt.datetime(2000, 1, 1, 12, 2, 22)),
+]
+
+
+def test_rows(tmp_path: Path):
+    out = tmp_path / "out.parquet"
+    Format.PARQUET.export(out)(rows, headers, types)
+
+    t = pq.read_table(out)
+    assert t.schema.field("C3").type == pa.decimal128(38, 4)
+    assert t.schema.field("C7").type == pa.timestamp("us")
+    assert [tuple(r.values()) for r in t.to_pylist()] == rows
+
+
+def test_numbers(tmp_path: Path):
+    "precision and scale from result metadata, instead of the first values, which may be null or have fewer decimals"
+    data = [(None, 1, Decimal("1.5")), (None, 2**70, Decimal("2.125"))]
+    out = tmp_path / "out.parquet"
+    columns = (("FIXED", 10, 2), ("FIXED", 38, 0), None)
+    Format.PARQUET.export(out, columns=columns)(data, ["C1", "C2", "C3"], [Decimal, int, Decimal])
+
+    t = pq.read_table(out)
+    assert t.schema.types == [pa.decimal128(10, 2), pa.decimal128(38, 0), pa.decimal128(38, 3)]
+    assert [tuple(r.values()) for r in t.to_pylist()] == data
+
+
+@pytest.mark.parametrize("format", [Format.PARQUET, Format.ARROW])
+def test_later_groups(format: Format, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    "timezone from result metadata, and without metadata, decimal scale from all row groups, not only the first"
+    monkeypatch.setattr("sfrun.formats.parquet.ROW_GROUP_SIZE", 1)
+    monkeypatch.setattr("sfrun.formats.ipc.BATCH_SIZE", 1)
+    utc = dt.datetime(2000, 1, 1, 12, tzinfo=dt.UTC)
+    data = [(None, Decimal("1.5")), (utc.astimezone(dt.timezone(dt.timedelta(hours=5))), Decimal("2.125"))]
+    out = tmp_path / "out"
+    format.export(out, columns=(("TIMESTAMP_TZ", None, None), None))(data, ["C1", "C2"], [dt.datetime, Decimal])
+
+    t = pq.read_table(out) if format is Format.PARQUET else pa.ipc.open_stream(out.read_bytes()).read_all()
+    assert t.schema.types == [pa.timestamp("us", tz="UTC"), pa.decimal128(38, 3)]
+    assert [tuple(r.values()) for r in t.to_pylist()] == [(None, Decimal("1.5")), (utc, Decimal("2.125"))]
+
+
+def test_empty(tmp_path: Path):
+    out = tmp_path / "out.parquet"
+    Format.PARQUET.export(out)([], headers, types)
+    assert pq.read_table(out).column_names == headers
+
+
+def test_needs_file():
+    with pytest.raises(ValueError):
+        Format.PARQUET.export()
@@ -0,0 +1,57 @@
+"test splitting exports into part files"
+
+import json
+from pathlib import Path
+
+import pytest
+
+from sfrun.formats import Format
+from sfrun.formats.parts import part_path
+
+headers = ["C1", "C2"]
+types = [int, str]
+rows = [(e, f"row {e}") for e in range(25)]
+
+
+def test_part_path():
+    assert part_path(Path("out.csv"), 1) == Path("out.part-0001.csv")
+    assert part_path(Path("d/out.csv.gz"), 12) == Path("d/out.part-0012.csv.gz")
+
+
+def test_max_rows(tmp_path: Path):
+    Format.CSV.export(tmp_path / "out.csv", max_rows=10)(rows, headers, types)
+
+    manifest = json.loads((tmp_path / "out.manifest.json").read_text())
+    assert manifest["rows"] == 25
+    assert [(p["file"], p["rows"]) for p in manifest["parts"]] == [
+        ("out.part-0001.csv", 10),
+        ("out.part-0002.csv", 10),
+        ("out.part-0003.csv", 5),
+    ]
+    for p in manifest["parts"]:
+        lines = (tmp_path / p["file"]).read_text().splitlines()
+        assert lines[0] == "C1,C2" and len(lines) == p["rows"] + 1
+
+
+def test_max_bytes(tmp_path: Path):
+    Format.JSONL.export(tmp_path / "out.jsonl", max_bytes=100)(rows, headers, types)
+
+    manifest = json.loads((tmp_path / "out.manifest.json").read_text())
+    assert sum(p["rows"] for p in manifest["parts"]) == 25
+    assert all(p["bytes"] < 100 + 40 for p in manifest["parts"])
+
+
+def test_empty(tmp_path: Path):
+    Format.CSV.export(tmp_path / "out.csv", max_rows=10)([], headers, types)
+    assert (tmp_path / "out.part-0001.csv").read_text().splitlines() == ["C1,C2"]
+
+
+def test_stdout():
+    with pytest.raises(ValueError):
+        Format.CSV.export(max_rows=10)
+
+
+@pytest.mark.parametrize("format", [Format.FMT, Format.MD, Format.XLS])
+def test_max_bytes_rejected(tmp_path: Path, format: Format):
+    with pytest.raises(ValueError, match="only be split by number of rows"):
+        format.export(tmp_path / "out", max_bytes=100)
@@ -0,0 +1,172 @@
+"test running commands in the daemon"
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pytest import CaptureFixture, MonkeyPatch
+
+from sfrun import serve
+from sfrun.client import forward
+
+
+@pytest.fixture
+def daemon(tmp_path: Path):
+    sock = tmp_path / "sfrun.sock"
+    proc = subprocess.Popen([sys.executable, "-c", "from sfrun.serve import cli; cli()", "--socket", str(sock), "--workers", "1"])
+    deadline = time.monotonic() + 60
+    while not sock.exists() and proc.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.1)
+    yield sock
+    proc.terminate()
+    proc.wait(10)
+    assert not sock.exists()
+
+
+def test_forward(daemon: Path, tmp_path: Path, monkeypatch: MonkeyPatch, capfd: CaptureFixture[str]):
+    (tmp_path / "a.sql").write_text("select 1;")
+    (tmp_path / "b.sql").write_text("-- depends: a.sql\nselect 2;")
+    monkeypatch.chdir(tmp_path)
+
+    # --plan doesn't connect; files are found relative to the client's working directory
+    assert forward("sfrunb", ["b.sql", "a.sql", "--plan"], daemon) == 0
+    out, _ = capfd.readouterr()
+    assert out.splitlines() == ["  1  a.sql", "  2  b.sql  (after a.sql)"]
+
+    assert forward("sfrunb", ["--bogus"], daemon) == 2
+    assert "unrecognized arguments: --bogus" in capfd.readouterr().err
+
+
+def test_no_daemon(tmp_path: Path):
+    assert forward("sfrunb", ["--version"], tmp_path / "sfrun.sock") is None
+
+
+def test_env(tmp_path: Path, monkeypatch: MonkeyPatch):
+    "commands run with the environment of the client, and the daemon's is restored after"
+    monkeypatch.delenv("SNOWFLAKE_HOME", raising=False)
+    monkeypatch.setattr(serve, "call", lambda *_: print(os.environ.get("SNOWFLAKE_HOME")) or 0)
+    with open(os.devnull) as stdin, (out := tmp_path / "out").open("w") as stdout:
+        fds = [stdin.fileno(), stdout.fileno(), stdout.fileno()]
+        home = serve.Home.save()
+        assert serve.run("sfrun", [], str(tmp_path), {"SNOWFLAKE_HOME": "/x"}, fds, home) == 0
+        home.close()
+    assert out.read_text() == "/x\n"
+    assert "SNOWFLAKE_HOME" not in os.environ
+
+
+def test_hangup():
+    a, b = socket.socketpair()
+    hung = threading.Event()
+    with a, b:
+        with serve.watching(a, hung.set):
+            time.sleep(0.1)
+        assert not hung.is_set()
+        with serve.watching(a, hung.set):
+            b.close()
+            assert hung.wait(5)
+
+
+class FakeCnx:
+    "connection with the session state that the lender looks at"
+
+    role, warehouse, database, schema = "R", "W", "D", "S"
+    session_id = 1
+
+    def __init__(self):
+        self.connection = self
+        self.parameters = {"AUTOCOMMIT": "true"}
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self) -> Any:
+        cnx = self
+
+        class Csr:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *_: object):
+                pass
+
+            def execute(self, sql: str, params: Any = None):
+                self.rows = {"show parameters in session": list(cnx.parameters.items()), "show variables": []}.get(sql, [("",)])
+                return self
+
+            def __iter__(self):
+                return iter(self.rows)
+
+            def fetchone(self):
+                return self.rows[0]
+
+        return Csr()
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_lender(monkeypatch: MonkeyPatch):
+    "connections are rolled back after each command, and closed instead of being reused if session state changed"
+    monkeypatch.setattr(serve, "getconn", lambda **_: FakeCnx())
+    lender = serve.Lender()
+    with lender.lend({}, False) as first:
+        pass
+    with lender.lend({}, False) as again:
+        again.parameters["AUTOCOMMIT"] = "false"
+    assert again is first and first.rollbacks == 2 and first.closed
+    with lender.lend({}, False) as other:
+        pass
+    assert other is not first and not other.closed
+
+
+@pytest.mark.parametrize("where", ["lend", "restore"])
+def test_hangup_in_teardown(where: str, tmp_path: Path, monkeypatch: MonkeyPatch):
+    "a client that goes away while a command's connection, or the worker, is restored leaves nothing behind"
+    monkeypatch.setattr(serve, "getconn", lambda **_: FakeCnx())
+    monkeypatch.delenv("SNOWFLAKE_HOME", raising=False)
+    lender = serve.Lender()
+    server, client = socket.socketpair()
+
+    def slowly(f: Any) -> Any:
+        def hangup(*args: Any) -> Any:
+            client.close()
+            time.sleep(1)  # the watcher sees the client go away meanwhile
+            return f(*args)
+
+        return hangup
+
+    if where == "lend":
+        monkeypatch.setattr(serve.Lender, "_restore", slowly(serve.Lender._restore))
+    else:
+        monkeypatch.setattr(serve.Home, "restore", slowly(serve.Home.restore))
+
+    def call(*_: Any) -> int:
+        with lender.lend({}, False):
+            return 0
+
+    monkeypatch.setattr(serve, "call", call)
+    cwd, stdout = os.getcwd(), os.fstat(1).st_ino
+    handler = signal.signal(signal.SIGUSR1, serve._disconnected)
+    try:
+        with server, open(os.devnull) as null:
+            request = {"prog": "sfrun", "args": [], "cwd": str(tmp_path), "env": {"SNOWFLAKE_HOME": "/x"}}
+            socket.send_fds(client, [json.dumps(request).encode() + b"\n"], [null.fileno()] * 3)
+            serve.handle(server, lender)
+    finally:
+        signal.signal(signal.SIGUSR1, handler)
+        client.close()
+    assert os.getcwd() == cwd and os.fstat(1).st_ino == stdout and "SNOWFLAKE_HOME" not in os.environ
+    assert not lender.lent and len(lender.idle) == 1
@@ -0,0 +1,33 @@
+"test exporting result batches to part files with a pool of processes"
+
+import json
+from pathlib import Path
+from typing import Any
+
+from sfrun.formats import Format
+from sfrun.shard import export_batches
+
+
+class FakeBatch:
+    "stands in for a ResultBatch, which is also picklable and creates its own row iterator"
+
+    def __init__(self, rows: list[tuple[Any, ...]]):
+        self.rows = rows
+
+    def create_iter(self):
+        return iter(self.rows)
+
+
+def test_export_batches(tmp_path: Path):
+    batches: Any = [FakeBatch([(b * 10 + e, f"r{b}.{e}") for e in range(b + 1)]) for b in range(4)]
+    export_batches(batches, Format.CSV.export(tmp_path / "out.csv"), ["C1", "C2"], [int, str], workers=2)
+
+    manifest = json.loads((tmp_path / "out.manifest.json").read_text())
+    assert manifest["rows"] == 10
+    assert [(p["file"], p["rows"]) for p in manifest["parts"]] == [(f"out.part-{n:04d}.csv", n) for n in range(1, 5)]
+    assert (tmp_path / "out.part-0003.csv").read_text().splitlines() == ["C1,C2", "20,r2.0", "21,r2.1", "22,r2.2"]
+
+
+def test_no_batches(tmp_path: Path):
+    export_batches([], Format.CSV.export(tmp_path / "out.csv"), ["C1"], [int], workers=2)
+    assert (tmp_path / "out.part-0001.csv").read_text().splitlines() == ["C1"]
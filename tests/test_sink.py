@@ -0,0 +1,78 @@
+"test buffered output sink"
+
+import contextlib
+import io
+from pathlib import Path
+
+import pytest
+from pytest import CaptureFixture
+
+from sfrun.formats import Format
+from sfrun.sink import Sink
+
+
+class Target(io.BytesIO):
+    "records each write"
+
+    def __init__(self):
+        super().__init__()
+        self.writes: list[bytes] = []
+
+    def write(self, b) -> int:  # type: ignore
+        self.writes.append(bytes(b))
+        return super().write(b)
+
+
+def test_chunks():
+    target = Target()
+    with Sink(target, buffer_size=10, close_target=False) as s:
+        s.writelines(["abcd\n"] * 5)
+        assert target.writes == [b"abcd\n" * 2, b"abcd\n" * 2]
+    assert target.writes[-1] == b"abcd\n"
+    assert target.getvalue() == b"abcd\n" * 5
+
+
+def test_bytes_written():
+    target = Target()
+    with Sink(target, close_target=False) as s:
+        print("café", file=s)
+        assert s.bytes_written == 6 and target.writes == []
+    assert target.getvalue() == "café\n".encode()
+
+
+def test_mixed():
+    "non-ASCII text is encoded once, as it is written, and kept in order with the text around it"
+    target = Target()
+    with Sink(target, buffer_size=100, close_target=False) as s:
+        s.writelines(["a\n", "é\n", "b\n", "ü\n"])
+        assert s.bytes_written == 10 and target.writes == []
+    assert target.writes == ["a\né\nb\nü\n".encode()]
+
+
+def test_line_buffering():
+    target = Target()
+    with Sink(target, close_target=False, line_buffering=True) as s:
+        s.write("ab")
+        assert target.writes == []
+        s.write("c\nd")
+        assert target.writes == [b"abc\nd"]
+
+
+def test_file(tmp_path: Path):
+    Format.JSONL.export(tmp_path / "out.jsonl", buffer_size=16)([(1, "a"), (2, "é")], ["C1", "C2"], [int, str])
+    assert (tmp_path / "out.jsonl").read_text() == '{"C1": 1, "C2": "a"}\n{"C1": 2, "C2": "\\u00e9"}\n'
+
+
+def test_stdout(capsys: CaptureFixture[str]):
+    print("before")
+    Format.RAW.export()([(1, None), (2, "x")], ["C1", "C2"], [int, str])
+    print("after")
+    assert capsys.readouterr().out == "before\n1\tNone\n2\tx\nafter\n"
+
+
+@pytest.mark.parametrize("fmt, expected", [(Format.CSV, "1,é\r\n"), (Format.JSON, '"C2": "\\u00e9"'), (Format.FMT, "│ é  │")])
+def test_redirected_stdout(fmt: Format, expected: str):
+    "stdout replaced by a text stream, which has no binary buffer"
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        fmt.export()([(1, "é")], ["C1", "C2"], [int, str])
+    assert expected in out.getvalue()
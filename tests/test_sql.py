@@ -1,3 +1,4 @@
+import time
 from itertools import zip_longest
 from textwrap import dedent
 
@@ -5,6 +6,7 @@ from pytest import CaptureFixture
 from snowflake.connector import SnowflakeConnection
 
 from sfrun import Format, run_sql
+from sfrun.sql import _run_parallel
 
 sql = """\
     select $1                as c1
@@ -95,3 +97,13 @@ def test_raw(cnx: SnowflakeConnection, capsys: CaptureFixture[str]):
                 """
             ),
         )
+
+
+def test_parallel(cnx: SnowflakeConnection, capsys: CaptureFixture[str]):
+    "queries run at the same time, and their results are printed in order"
+    jobs = [(f"select {n} as n, system$wait({3 - n}) as w", False, Format.CSV.export()) for n in range(3)]
+    start = time.monotonic()
+    _run_parallel(cnx, jobs, parallel=3)
+    assert time.monotonic() - start < 5  # one after the other takes 6 seconds
+
+    assert [line.split(",")[0] for line in capsys.readouterr().out.splitlines()] == ["N", "0", "N", "1", "N", "2"]
@@ -1,11 +1,15 @@
 "test error handling"
 
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, cast
 
 from pytest import CaptureFixture
-from snowflake.connector import SnowflakeConnection
+from snowflake.connector import DatabaseError, SnowflakeConnection
 
 from sfrun import SqlScript
+from sfrun.metrics import Metrics
+from sfrun.runner import SqlRunner
 
 
 def test_skip_on_error(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
@@ -30,3 +34,65 @@ def test_dont_skip_on_error(tmp_path: Path, cnx: SnowflakeConnection, capsys: Ca
     output = capsys.readouterr().out
     assert "one" in output
     assert "two" not in output
+
+
+def test_batched(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str]) -> None:
+    sqlf = tmp_path / "test.sql"
+    sqlf.write_text("select 'one'; select 'two', 2; select 'three';")
+
+    assert SqlScript(sqlf).run(cnx)
+    expected = capsys.readouterr().out
+
+    assert SqlScript(sqlf, batch_size=2).run(cnx)
+    assert capsys.readouterr().out == expected
+
+
+def test_batched_error(tmp_path: Path, cnx: SnowflakeConnection, capsys: CaptureFixture[str], caplog) -> None:
+    sqlf = tmp_path / "test.sql"
+    sqlf.write_text("select 'one'; select current_u(); select 'two';")
+
+    assert not SqlScript(sqlf, stop_on_error=False, batch_size=3).run(cnx)
+
+    output = capsys.readouterr().out
+    assert "one" in output
+    assert "two" in output
+    assert "statement 2 failed" in caplog.text
+
+
+class NoHistory:
+    "cursor that fails the second statement of multi-statement requests, and can't look up query history"
+
+    def __init__(self):
+        self.log: list[str] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_: object):
+        pass
+
+    def execute(self, sql: str, params: Any = None, num_statements: int | None = None):
+        if params is not None:
+            raise DatabaseError("query history is not available")
+        if num_statements is not None:
+            self.log.append(sql)
+            raise DatabaseError("failed", sfqid="q")
+        raise AssertionError("statements of a failed batch are not run again")
+
+
+def test_batched_no_history(capsys: CaptureFixture[str]) -> None:
+    "without query history, statements of a failed batch are shown and recorded, each on its own, as not completed"
+    metrics = Metrics()
+    csr = NoHistory()
+    cnx = cast(SnowflakeConnection, SimpleNamespace(cursor=lambda: csr))
+    assert not SqlRunner(["select 1;", "select 2;"], stop_on_error=False, batch_size=2, metrics=metrics).run(cnx)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "select 1;",
+        "-- statement 1 is not known to have completed",
+        "",
+        "select 2;",
+        "-- statement 2 is not known to have completed",
+    ]
+    assert [(m.statement, m.ok) for m in metrics.statements] == [(1, False), (2, False)]
+    assert len(csr.log) == 1
@@ -0,0 +1,34 @@
+"test reading statements of a script as they are run"
+
+import os
+import sys
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+from sfrun import SqlScript
+
+
+def test_file(tmp_path: Path):
+    (sqlf := tmp_path / "test.sql").write_text("\n-- first\nselect 1;\n\n select 2\n;  \n/* third */ select 3\n")
+    with SqlScript(sqlf).statements() as sqls:
+        assert list(sqls) == ["select 1;", "select 2\n;", "select 3"]
+
+
+def test_pipe(monkeypatch: MonkeyPatch):
+    rd, wr = os.pipe()
+    with os.fdopen(rd) as stdin, os.fdopen(wr, "w") as pipe:
+        monkeypatch.setattr(sys, "stdin", stdin)
+        with SqlScript(None).statements() as sqls:
+            it = iter(sqls)
+            pipe.write("select 1;\nselect 2;\n")
+            pipe.flush()
+            assert next(it) == "select 1;"  # doesn't wait for the pipe to be closed
+            pipe.write("select 3;\n")
+            pipe.close()
+            assert list(it) == ["select 2;", "select 3;"]
+
+
+def test_sqls():
+    "statements of a script are those of its source"
+    assert list(SqlScript("select 1; select 2;").sqls) == ["select 1;", "select 2;"]
@@ -0,0 +1,37 @@
+"test utility functions"
+
+import time
+from threading import get_ident
+
+from sfrun.util import ordered_map
+
+
+def test_ordered_map():
+    def slow_square(x: int) -> int:
+        time.sleep(0.01 * (10 - x))
+        return x * x
+
+    assert list(ordered_map(slow_square, range(10), threads=4)) == [x * x for x in range(10)]
+
+
+def test_ordered_map_in_flight():
+    started: list[int] = []
+
+    def record(x: int) -> int:
+        started.append(x)
+        return get_ident()
+
+    results = ordered_map(record, range(100), threads=2, in_flight=3)
+    next(results)
+    time.sleep(0.05)
+    assert len(started) <= 4
+    results.close()
+
+
+def test_ordered_map_stop():
+    def slow(x: int) -> int:
+        time.sleep(0.05 if x == 1 else 0)
+        return x
+
+    # 1 fails; 2 and 3 had started and are still returned, in order, but nothing after them is started
+    assert list(ordered_map(slow, range(10), threads=4, in_flight=3, stop=lambda x: x == 1)) == [0, 1, 2, 3]
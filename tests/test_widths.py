@@ -0,0 +1,56 @@
+"test column widths fixed from a sample of rows"
+
+from io import StringIO
+from itertools import count
+
+import pytest
+from yappt.types import HAlign
+
+from sfrun.formats import fmt, md
+from sfrun.formats.widths import aligned_iter
+
+headers = ["id", "name"]
+types = [int, str]
+rows = [(1, "a"), (22, "bb"), (333, "ccc")]
+
+
+@pytest.mark.parametrize("write", [fmt.write, md.write])
+def test_same_as_buffered(write):
+    "widths sampled from all rows match the buffered output"
+    expected, actual = StringIO(), StringIO()
+    write(rows, headers, types, expected)
+    write(rows, headers, types, actual, sample=len(rows))
+    assert actual.getvalue() == expected.getvalue()
+
+
+def test_truncated():
+    out = list(aligned_iter([["id", "name"], ["1", "a"], ["22", "bbbbbb"]], [HAlign.RIGHT, HAlign.LEFT], sample=1))
+    assert out == [["id", "name"], [" 1", "a   "], ["22", "bbb…"]]
+
+
+def test_hints():
+    "narrow metadata widths widen columns, wide ones are ignored"
+    out = list(aligned_iter([["id", "name"], ["1", "a"]], [HAlign.RIGHT, HAlign.LEFT], sample=1, hints=[5, 10_000]))
+    assert out == [["   id", "name"], ["    1", "a   "]]
+
+
+def test_streamed():
+    "rows past the sample are not read before the first line is output"
+    seen = []
+
+    def endless():
+        for n in count():
+            seen.append(n)
+            yield (n, "x")
+
+    it = aligned_iter(([str(n), v] for n, v in endless()), [HAlign.RIGHT, HAlign.LEFT], sample=10)
+    next(it)
+    assert len(seen) == 11
+
+
+@pytest.mark.parametrize("write", [fmt.write, md.write])
+def test_empty(write):
+    "headers are output even if there are no rows"
+    out = StringIO()
+    write([], headers, types, out, sample=10)
+    assert "id" in out.getvalue() and "name" in out.getvalue()
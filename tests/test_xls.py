@@ -0,0 +1,61 @@
+"test Excel export"
+
+import datetime as dt
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from openpyxl import load_workbook
+
+from sfrun.formats import Format, xls
+
+headers = ["C1", "C2", "C3", "C4"]
+types = [int, str, Decimal, dt.datetime]
+rows = [
+    (1, "one", Decimal("1.1"), dt.datetime(2000, 1, 1, 11, 1, 1, tzinfo=dt.UTC)),
+    (2, None, None, dt.datetime(2000, 1, 2)),
+]
+
+backends = [xls.OpenpyxlBook] + ([xls.XlsxwriterBook] if xls.xlsxwriter is not None else [])
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_export(backend: type, tmp_path: Path):
+    out = tmp_path / "out.xlsx"
+    book = backend(out)
+    xls.write_sheet(book, "Sheet1", rows, headers, types)
+    book.close()
+
+    ws = load_workbook(out).active
+    assert list(ws.values) == [
+        tuple(headers),
+        (1, "one", 1.1, dt.datetime(2000, 1, 1, 11, 1, 1)),
+        (2, None, None, dt.datetime(2000, 1, 2)),
+    ]
+    assert ws["A2"].number_format == "#,##0"
+    assert ws["D3"].number_format == "yyyy-mm-dd hh:mm:ss"
+    assert ws["B2"].font.name == "Hack"
+    assert ws["A1"].font.b
+
+
+@pytest.mark.parametrize("backend", backends)
+def test_rollover(backend: type, tmp_path: Path):
+    out = tmp_path / "out.xlsx"
+    book = backend(out)
+    xls.write_sheet(book, "T", [(e,) for e in range(5)], ["N"], [int], max_rows=3)
+    book.close()
+
+    wb = load_workbook(out)
+    assert wb.sheetnames == ["T", "T (2)", "T (3)"]
+    assert [[r[0] for r in wb[s].values] for s in wb.sheetnames] == [["N", 0, 1], ["N", 2, 3], ["N", 4]]
+
+
+def test_workbook_sheets(tmp_path: Path):
+    out = tmp_path / "out.xlsx"
+    with Format.XLS.export(out).sheets() as sheet:
+        sheet("db.sch.orders")(rows, headers, types)
+        sheet("Query 2")([(1,)], ["X"], [int])
+
+    wb = load_workbook(out)
+    assert wb.sheetnames == ["db.sch.orders", "Query 2"]
+    assert wb["Query 2"]["A2"].value == 1